@@ -1,12 +1,13 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import zipfile
+import hashlib
 import os
-import time
 
 # import scrape function AND the module so we can toggle the proxy flag
 from scraper_main import scrape_into_dataframe, download_images
+from exporters import ZipBuilder
+import metrics
 import scraper_main
 
 # 🧭 Page Setup
@@ -17,6 +18,40 @@ if "scraped_data" not in st.session_state:
     st.session_state.scraped_data = None
 if "downloaded_images_files" not in st.session_state:
     st.session_state.downloaded_images_files = None
+if "downloaded_images_zip" not in st.session_state:
+    st.session_state.downloaded_images_zip = None
+if "last_metrics" not in st.session_state:
+    st.session_state.last_metrics = None
+if "result_id" not in st.session_state:
+    st.session_state.result_id = None
+
+PAGE_SIZES = [50, 100, 500, 1000, 5000]
+
+
+# 💾 Memoized scrape - the same (url, type, limit, tag, prompt, key) is answered from memory on repeat clicks
+# The key itself stays out of the cache (underscore), only a fingerprint of it is hashed
+def api_key_id(api_key):
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16] if api_key else None
+
+
+@st.cache_data(show_spinner=False, max_entries=16, ttl=3600)
+def cached_scrape(url, tag_type, limit, custom_tag, parse_text, key_id=None, _api_key=None, _misses=None):
+    if _misses is not None:
+        _misses.append(url)  # only runs on a cache miss
+    return scrape_into_dataframe(url, tag_type=tag_type, limit=limit, custom_tag=custom_tag, parse_text=parse_text, api_key=_api_key)
+
+
+def reset_result_page():
+    # Page numbers mean different rows at another page size - start again from the first page
+    st.session_state.result_page = 1
+
+
+# 📦 Downloads are built the first time they are asked for, then kept per result
+@st.cache_data(show_spinner=False, max_entries=8)
+def build_export(result_id, fmt, _df):
+    if fmt == "csv":
+        return _df.to_csv(index=False).encode("utf-8")
+    return _df.to_string(index=False).encode("utf-8")
 
 # 🌐 Custom CSS for Modern UI
 st.markdown("""
@@ -122,18 +157,25 @@ if st.button("🚀 Scrape Site"):
         with st.spinner("🔎 Scraping in progress... please wait ⏳"):
             try:
                 start_time = datetime.now()
-                df = scrape_into_dataframe(
-                    url, 
-                    tag_type=tag_key, 
-                    limit=limit, 
-                    custom_tag=custom_tag, 
-                    parse_text=parse_text,
-                    api_key=api_key
-                )
+                metrics_before = metrics.snapshot()
+                misses = []
+                if tag_key == "rawhtml":
+                    # Raw HTML writes page_content.txt as a side effect, so it is never memoized
+                    df = scrape_into_dataframe(url, tag_type=tag_key, limit=limit, custom_tag=custom_tag, parse_text=parse_text, api_key=api_key)
+                else:
+                    df = cached_scrape(url, tag_key, limit, custom_tag, parse_text, api_key_id(api_key),
+                                       _api_key=api_key, _misses=misses)
                 duration = round((datetime.now() - start_time).total_seconds(), 2)
                 
                 # Store in session state
                 st.session_state.scraped_data = df
+                st.session_state.result_id = (url, tag_key, limit, custom_tag, parse_text, start_time.isoformat())
+                st.session_state.result_page = 1
+                if misses or tag_key == "rawhtml":
+                    st.session_state.last_metrics = metrics.diff(metrics_before)
+                else:
+                    st.session_state.last_metrics = None
+                    st.info("💾 Served from cache - same URL and settings as an earlier scrape")
                 st.session_state.last_url = url
                 st.session_state.last_tag_type = tag_type
 
@@ -171,36 +213,58 @@ if st.session_state.scraped_data is not None:
         with col3:
              st.markdown(f"<p style='font-size:15px;'>🕒 <b>Time:</b> Done</p>", unsafe_allow_html=True)
 
+        # ⏱️ Per-stage timing of the last scrape
+        report = st.session_state.last_metrics
+        if report and report["stages"]:
+            with st.expander("⏱️ Where the time went"):
+                breakdown = pd.DataFrame(metrics.stage_breakdown(report))
+                st.bar_chart(breakdown.set_index("stage")["seconds"])
+                st.dataframe(breakdown, use_container_width=True, hide_index=True)
+                
+                counters = report["counters"]
+                col_m1, col_m2, col_m3 = st.columns(3)
+                col_m1.metric("Downloaded", f"{counters.get('bytes_downloaded', 0) / 1024:.1f} KB")
+                col_m2.metric("LLM calls", counters.get("llm_calls", 0))
+                col_m3.metric("LLM tokens", sum(v for k, v in counters.items() if k.startswith("llm_tokens")))
+                for cache, entry in report["caches"].items():
+                    st.caption(f"💾 {cache} cache: {entry['hits']}/{entry['requests']} hits ({entry['hit_rate']:.0%})")
+
         # 👀 Show preview (first 5 rows)
         st.markdown("### 👀 Quick Preview (first 5 rows)")
         st.dataframe(df.head(), use_container_width=True)
 
-        # Full Data (inside expander)
-        with st.expander("📄 View Full Scraped Data"):
-            st.dataframe(df, use_container_width=True)
-
-        # Prepare data for download (outside expander)
-        csv_data = df.to_csv(index=False).encode("utf-8")
-        txt_data = df.to_string(index=False)
+        # Full Data (inside expander) - only one page of rows is sent to the browser per rerun
+        with st.expander(f"📄 View Full Scraped Data ({len(df):,} rows)"):
+            col_p1, col_p2 = st.columns([1, 3])
+            with col_p1:
+                page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1, key="result_page_size",
+                                         on_change=reset_result_page)
+            pages = max(1, -(-len(df) // page_size))
+            with col_p2:
+                page = st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, step=1, key="result_page")
+            start = (int(page) - 1) * page_size
+            st.dataframe(df.iloc[start:start + page_size], use_container_width=True)
+            st.caption(f"Rows {start + 1:,}–{min(start + page_size, len(df)):,} of {len(df):,}")
 
+        # Downloads are serialized on first request only, then served from the cache
         st.markdown("### 📦 Download Extracted Data")
+        result_id = st.session_state.result_id
         col_a, col_b = st.columns(2)
-        with col_a:
-            st.download_button(
-                "⬇️ Download as CSV",
-                csv_data,
-                "scraped_data.csv",
-                "text/csv",
-                use_container_width=True
-            )
-        with col_b:
-            st.download_button(
-                "⬇️ Download as TXT",
-                txt_data,
-                "scraped_data.txt",
-                "text/plain",
-                use_container_width=True
-            )
+        for column, fmt, mime in ((col_a, "csv", "text/csv"), (col_b, "txt", "text/plain")):
+            with column:
+                ready_key = f"export_ready_{fmt}"
+                if st.session_state.get(ready_key) != result_id:
+                    if st.button(f"🛠️ Prepare {fmt.upper()}", use_container_width=True, key=f"prepare_{fmt}"):
+                        st.session_state[ready_key] = result_id
+                if st.session_state.get(ready_key) == result_id:
+                    st.download_button(
+                        f"⬇️ Download as {fmt.upper()}",
+                        build_export(result_id, fmt, df),
+                        f"scraped_data.{fmt}",
+                        mime,
+                        use_container_width=True,
+                        key=f"download_{fmt}"
+                    )
         
         # 🖼️ Image Download Option
         if tag_type == "Only Images" and not df.empty and "src" in df.columns:
@@ -217,48 +281,35 @@ if st.session_state.scraped_data is not None:
                 with st.spinner("📥 Downloading images... this may take a moment"):
                     try:
                         image_urls = df["src"].tolist()
-                        # Extract base domain from URL for relative links
-                        from urllib.parse import urlparse
-                        parsed = urlparse(url)
-                        base_url = f"{parsed.scheme}://{parsed.netloc}"
+                        # Relative links are resolved against the scraped page itself
+                        base_url = url if url.startswith(('http://', 'https://')) else 'https://' + url
                         
                         st.info(f"🔗 Base URL: {base_url}")
                         
-                        downloaded_files = download_images(image_urls, base_url=base_url, output_folder="downloaded_images")
+                        # ZIP is built in memory while the downloads complete (JPEG/PNG/WebP are stored, not re-deflated)
+                        zip_builder = ZipBuilder()
+                        downloaded_files = download_images(
+                            image_urls,
+                            base_url=base_url,
+                            output_folder="downloaded_images",
+                            on_complete=lambda item: zip_builder.add_file(item["path"])
+                        )
+                        zip_data = zip_builder.close()
                         
-                        # Store in session state
+                        # Store in session state (reruns reuse the same bytes instead of rebuilding the ZIP)
                         st.session_state.downloaded_images_files = downloaded_files
+                        st.session_state.downloaded_images_zip = zip_data if downloaded_files else None
                         
                         if downloaded_files:
                             st.success(f"✅ Downloaded {len(downloaded_files)} images!")
                             
-                            # Create ZIP file for download
-                            zip_filename = "downloaded_images.zip"
-                            try:
-                                if os.path.exists(zip_filename):
-                                    os.remove(zip_filename)
-                            except:
-                                pass
-                            
-                            # Create ZIP and close it properly
-                            with zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                                for file in downloaded_files:
-                                    if os.path.exists(file):
-                                        arcname = os.path.basename(file)
-                                        zipf.write(file, arcname=arcname)
-                            
-                            # Now read and display download button
-                            time.sleep(0.5)  # Small delay to ensure file is released
-                            if os.path.exists(zip_filename):
-                                with open(zip_filename, "rb") as f:
-                                    zip_data = f.read()
-                                st.download_button(
-                                    "📦 Download All Images (ZIP)",
-                                    zip_data,
-                                    zip_filename,
-                                    "application/zip",
-                                    use_container_width=True
-                                )
+                            st.download_button(
+                                "📦 Download All Images (ZIP)",
+                                zip_data,
+                                "downloaded_images.zip",
+                                "application/zip",
+                                use_container_width=True
+                            )
                             
                             # Show thumbnails
                             st.markdown("**📸 Preview of downloaded images:**")
@@ -280,15 +331,13 @@ if st.session_state.scraped_data is not None:
                 st.markdown("### 📥 Downloaded Images")
                 st.info(f"✅ {len(st.session_state.downloaded_images_files)} images ready for download")
                 
-                # Recreate ZIP for download
-                zip_filename = "downloaded_images.zip"
-                if os.path.exists(zip_filename) and st.session_state.downloaded_images_files:
-                    with open(zip_filename, "rb") as f:
-                        zip_data = f.read()
+                # Serve the ZIP built during the download
+                zip_data = st.session_state.downloaded_images_zip
+                if zip_data:
                     st.download_button(
                         "📦 Download All Images (ZIP)",
                         zip_data,
-                        zip_filename,
+                        "downloaded_images.zip",
                         "application/zip",
                         use_container_width=True,
                         key="redownload_zip"
@@ -0,0 +1,179 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+from http_session import get_session
+
+# Default per-host politeness limits
+REQUESTS_PER_SECOND = 4.0   # request starts per second, per host
+MAX_IN_FLIGHT = 2           # concurrent requests, per host
+RESPECT_ROBOTS = True       # honour robots.txt Crawl-delay (when larger than the rate limit)
+FETCH_THREADS = 64          # threads running blocking fetches - caps requests in flight across all hosts
+
+
+class HostLimiter:
+    """Rate limit + in-flight limit for a single host"""
+
+    def __init__(self, interval, max_in_flight):
+        self.interval = interval
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self._lock = asyncio.Lock()
+        self._next_start = 0.0
+
+    async def wait_turn(self):
+        """Reserve the next start time for this host and sleep until it arrives"""
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+class PoliteScheduler:
+    """
+    Per-host politeness scheduler - different hosts proceed in parallel,
+    each host gets at most `requests_per_second` starts and `max_in_flight` open requests
+    """
+
+    def __init__(self, requests_per_second=None, max_in_flight=None, respect_robots=None, user_agent="*"):
+        self.requests_per_second = requests_per_second or REQUESTS_PER_SECOND
+        self.max_in_flight = max_in_flight or MAX_IN_FLIGHT
+        self.respect_robots = RESPECT_ROBOTS if respect_robots is None else respect_robots
+        self.user_agent = user_agent
+        self._hosts = {}
+        self._pending = {}
+
+    async def _limiter(self, url):
+        parsed = urlparse(url)
+        host = parsed.netloc
+        if host in self._hosts:
+            return self._hosts[host]
+
+        # Only one coroutine looks up robots.txt for a host, the others wait for it
+        if host not in self._pending:
+            self._pending[host] = asyncio.ensure_future(self._create_limiter(parsed))
+        limiter = await asyncio.shield(self._pending[host])
+        self._hosts[host] = limiter
+        self._pending.pop(host, None)
+        return limiter
+
+    async def _create_limiter(self, parsed):
+        interval = 1.0 / self.requests_per_second
+        if self.respect_robots:
+            delay = await asyncio.get_running_loop().run_in_executor(
+                _get_executor(), self._robots_crawl_delay, f"{parsed.scheme}://{parsed.netloc}/robots.txt")
+            if delay:
+                interval = max(interval, float(delay))
+        return HostLimiter(interval, self.max_in_flight)
+
+    def _robots_crawl_delay(self, robots_url):
+        try:
+            response = get_session(retry=False).get(robots_url, timeout=5, verify=False)
+            if response.status_code != 200:
+                return None
+            robots = RobotFileParser()
+            robots.parse(response.text.splitlines())
+            return robots.crawl_delay(self.user_agent)
+        except Exception:
+            return None
+
+    @asynccontextmanager
+    async def slot(self, url):
+        """Wait until `url`'s host may be hit again, hold an in-flight slot while inside"""
+        limiter = await self._limiter(url)
+        async with limiter.semaphore:
+            await limiter.wait_turn()
+            yield
+
+    async def run(self, url, func, *args, **kwargs):
+        """Run a blocking call for `url` in a worker thread once the host allows it"""
+        async with self.slot(url):
+            # Explicit pool - the loop's default executor (min(32, cpu + 4) threads) would cap
+            # concurrency below the per-host limits summed over all hosts
+            return await asyncio.get_running_loop().run_in_executor(_get_executor(), functools.partial(func, *args, **kwargs))
+
+
+# Background event loop used by the sync wrappers (fetch_page, download_images)
+_loop = None
+_loop_lock = threading.Lock()
+_scheduler = None
+_scheduler_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Thread pool for blocking fetches, shared by every scheduler and event loop"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=FETCH_THREADS, thread_name_prefix="polite-fetch")
+    return _executor
+
+
+def _get_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop.set_default_executor(_get_executor())
+            threading.Thread(target=_loop.run_forever, name="polite-fetch-loop", daemon=True).start()
+    return _loop
+
+
+def run_sync(coro):
+    """Run a coroutine on the shared background loop and wait for its result"""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+
+def configure_scheduler(**options):
+    """Replace the shared scheduler used by the sync wrappers (e.g. requests_per_second=1)"""
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = PoliteScheduler(**options)
+
+
+def get_scheduler():
+    """Shared scheduler (created on first use)"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = PoliteScheduler()
+        return _scheduler
+
+
+def polite_call(url, func, *args, **kwargs):
+    """Blocking helper - run func(*args, **kwargs) under the shared per-host scheduler"""
+    return run_sync(get_scheduler().run(url, func, *args, **kwargs))
+
+
+async def fetch_async(url, use_proxies=True, scheduler=None):
+    """
+    Fetch one page without blocking the event loop
+    Without a scheduler the shared one is used, so the politeness limits also cover these fetches
+    """
+    from scraper_main import fetch_page_direct
+
+    if scheduler is None:
+        # The shared scheduler's locks belong to the background loop - run it there and await the result here
+        future = asyncio.run_coroutine_threadsafe(get_scheduler().run(url, fetch_page_direct, url, use_proxies), _get_loop())
+        return await asyncio.wrap_future(future)
+    return await scheduler.run(url, fetch_page_direct, url, use_proxies)
+
+
+async def fetch_many_async(urls, use_proxies=True, scheduler=None, **options):
+    """
+    Fetch many pages concurrently under one per-host scheduler (the shared one unless
+    a scheduler or scheduler options are given)
+    Returns HTML strings (or the raised exception) in the same order as `urls`
+    """
+    if scheduler is None and options:
+        scheduler = PoliteScheduler(**options)
+    tasks = [fetch_async(url, use_proxies=use_proxies, scheduler=scheduler) for url in urls]
+    return await asyncio.gather(*tasks, return_exceptions=True)
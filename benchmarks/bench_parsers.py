@@ -0,0 +1,93 @@
+"""
+Parser benchmark - compares BeautifulSoup parser backends on large generated pages
+and shows what a document-cache hit saves when switching extraction modes.
+
+    python benchmarks/bench_parsers.py [--sizes 100,1000,5000] [--repeat 3]
+
+Sizes are in KB.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from doc_cache import DocumentCache  # noqa: E402
+from scraper_main import extract_data  # noqa: E402
+
+PARSERS = ["html.parser", "lxml", "html5lib"]
+MODES = ["alltext", "headings", "links", "images", "paragraphs"]
+
+
+def generate_page(size_kb):
+    """Product-listing style page of roughly `size_kb` kilobytes"""
+    card = (
+        '<div class="card"><h3>Product {i}</h3><img src="/img/{i}.jpg" alt="Product {i}">'
+        '<p>Description for product {i} with some <b>bold</b> text.</p>'
+        '<span class="price">${i}.99</span><a href="/product/{i}">View</a></div>\n'
+    )
+    parts = ["<html><head><title>Listing</title><script>var x = 1;</script></head><body><h1>Listing</h1>"]
+    size = 0
+    i = 0
+    while size < size_kb * 1024:
+        block = card.format(i=i)
+        parts.append(block)
+        size += len(block)
+        i += 1
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def available_parsers():
+    parsers = []
+    for parser in PARSERS:
+        try:
+            BeautifulSoup("<p></p>", parser)
+            parsers.append(parser)
+        except Exception:
+            pass
+    return parsers
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,1000,5000", help="page sizes in KB, comma separated")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'size':>8}  {'parser':<12} {'parse':>9} {'all modes (re-parse)':>21} {'all modes (cached)':>19}")
+    for size_kb in [int(s) for s in args.sizes.split(",")]:
+        html = generate_page(size_kb)
+        for name in available_parsers():
+            parse_time = best_of(args.repeat, lambda: BeautifulSoup(html, name))
+
+            # Old behaviour: every extraction mode parses the page again
+            def reparse_all():
+                for mode in MODES:
+                    extract_data(BeautifulSoup(html, name), mode, limit=None)
+
+            # New behaviour: one parse, then every mode reads the cached tree
+            def cached_all():
+                cache = DocumentCache(max_bytes=float("inf"))  # measure the cached path even for huge pages
+                for mode in MODES:
+                    extract_data(cache.parse(html, name), mode, limit=None)
+
+            reparse_time = best_of(args.repeat, reparse_all)
+            cached_time = best_of(args.repeat, cached_all)
+            print(f"{size_kb:>6}KB  {name:<12} {parse_time:>8.3f}s {reparse_time:>20.3f}s {cached_time:>18.3f}s")
+
+
+if __name__ == "__main__":
+    main()
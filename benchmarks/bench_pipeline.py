@@ -0,0 +1,252 @@
+"""
+End-to-end pipeline benchmark - runs scrape_into_dataframe against a local fixture server
+(no internet, stub LLM, optional stub proxies) and records per-scenario timings.
+
+    python benchmarks/bench_pipeline.py [--sizes 10,100,1000,20000] [--kinds listing,links,images,nested]
+                                        [--tag-types alltext,links,images] [--repeat 5]
+                                        [--ai --llm-latency 0.2] [--proxies none|slow|dead|mixed]
+                                        [--output results.json] [--compare baseline.json --threshold 0.1]
+
+Sizes are in KB. For every page kind x size x tag_type it reports throughput, p50/p95 latency,
+peak RSS, time per stage (from metrics.py) and peak traced allocations per stage.
+Results are written as JSON; --compare prints the change against an earlier run and exits
+with status 1 when a metric regressed by more than --threshold.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import async_fetch  # noqa: E402
+import metrics  # noqa: E402
+import parse  # noqa: E402
+import scraper_main  # noqa: E402
+from chunker import chunk_blocks, chunk_page  # noqa: E402
+from doc_cache import get_document_cache, parse_document  # noqa: E402
+from fixtures import FixtureServer, StubProxy, make_stub_llm  # noqa: E402
+from proxy_pool import ProxyPool  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+TAG_TYPES = ["alltext", "headings", "paragraphs", "links", "images"]
+
+# Compared by --compare: metric -> True when higher is better
+COMPARED = {"latency_p50": False, "latency_p95": False, "throughput_pages_s": True}
+
+
+def percentile(values, p):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p * len(ordered)) - 1)]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def setup(fixture, args):
+    """Point the pipeline at the offline fixtures"""
+    scraper_main.HTTP_CACHE_DIR = ""  # every run fetches
+    async_fetch.configure_scheduler(requests_per_second=10000, max_in_flight=64, respect_robots=False)
+    parse.LLM_CACHE_PATH = ""
+    parse._rate_limiter = parse.RateLimiter(requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9)
+    llm = make_stub_llm(latency=args.llm_latency)
+    parse.get_llm = lambda api_key=None, model_name=None: llm
+
+    proxies = []
+    if args.proxies in ("slow", "mixed"):
+        proxies.append(StubProxy(fixture, delay=args.proxy_delay).start())
+    if args.proxies in ("dead", "mixed"):
+        proxies.append(StubProxy(fixture, dead=True).start())
+    if proxies:
+        scraper_main.PROXY_SOURCE_URL = "stub"
+        scraper_main._proxy_pool = ProxyPool(lambda: [p.url for p in proxies], ttl=10 ** 6, timeout=args.proxy_timeout)
+        scraper_main._proxy_pool.wait_ready()
+    else:
+        scraper_main.PROXY_SOURCE_URL = ""
+    return proxies
+
+
+def measure_allocations(url, tag_type, parse_text, use_proxies):
+    """Peak traced allocation (bytes) of each stage, run once in isolation"""
+    allocations = {}
+
+    def traced(stage, func):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        result = func()
+        allocations[stage] = tracemalloc.get_traced_memory()[1] - base
+        return result
+
+    get_document_cache().clear()
+    tracemalloc.start()
+    try:
+        html = traced("fetch", lambda: scraper_main.fetch_page(url, use_proxies=use_proxies, use_cache=False))
+        soup = traced("parse", lambda: parse_document(html))
+        data = traced("extract", lambda: scraper_main.extract_data(soup, tag_type, limit=50))
+        if parse_text:
+            if tag_type == "alltext":
+                traced("chunk", lambda: chunk_page(soup))
+            else:
+                traced("chunk", lambda: chunk_blocks([" | ".join(str(v) for v in d.values() if v) for d in data]))
+        traced("build_dataframe", lambda: scraper_main.build_dataframe(soup, tag_type, limit=50, parse_text=parse_text))
+    finally:
+        tracemalloc.stop()
+    return allocations
+
+
+def run_scenario(fixture, kind, size_kb, tag_type, args):
+    url = fixture.url(kind, size_kb)
+    parse_text = "the main items" if args.ai else None
+    use_proxies = args.proxies != "none"
+    page_bytes = len(fixture.page(f"/{kind}/{size_kb}.html"))
+
+    # Warm-up: connection pools, proxy stats, lazy imports
+    scraper_main.scrape_into_dataframe(url, tag_type, parse_text=parse_text, use_proxies=use_proxies)
+
+    latencies = []
+    before = metrics.snapshot()
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        get_document_cache().clear()  # measure the parse on every run
+        run_start = time.perf_counter()
+        scraper_main.scrape_into_dataframe(url, tag_type, parse_text=parse_text, use_proxies=use_proxies)
+        latencies.append(time.perf_counter() - run_start)
+    total = time.perf_counter() - start
+    report = metrics.diff(before)
+
+    stages = {}
+    for stage, entry in report["stages"].items():
+        name = stage.split("{", 1)[0]
+        stages[name] = round(stages.get(name, 0.0) + entry["seconds"] / args.repeat, 6)
+
+    result = {
+        "scenario": f"{kind}-{size_kb}KB-{tag_type}" + ("-ai" if args.ai else "") + (f"-{args.proxies}" if use_proxies else ""),
+        "kind": kind,
+        "size_kb": size_kb,
+        "page_bytes": page_bytes,
+        "tag_type": tag_type,
+        "ai": args.ai,
+        "proxies": args.proxies,
+        "runs": args.repeat,
+        "throughput_pages_s": round(args.repeat / total, 3),
+        "throughput_mb_s": round(args.repeat * page_bytes / total / 1e6, 3),
+        "latency_p50": round(percentile(latencies, 0.5), 6),
+        "latency_p95": round(percentile(latencies, 0.95), 6),
+        "latency_mean": round(sum(latencies) / len(latencies), 6),
+        "stage_seconds": stages,
+        "llm_calls": report["counters"].get("llm_calls", 0) / args.repeat,
+    }
+    if not args.no_alloc:
+        result["allocations"] = measure_allocations(url, tag_type, parse_text, use_proxies)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def compare(results, baseline, threshold):
+    """Print the change per scenario/metric against a baseline run, return the regressions"""
+    previous = {r["scenario"]: r for r in baseline["results"]}
+    regressions = []
+    print(f"\n{'scenario':<40} {'metric':<20} {'baseline':>10} {'current':>10} {'change':>8}")
+    for result in results:
+        old = previous.get(result["scenario"])
+        if old is None:
+            continue
+        checks = dict(COMPARED)
+        checks.update({f"allocations.{stage}": False for stage in result.get("allocations", {})})
+        for metric, higher_is_better in checks.items():
+            if metric.startswith("allocations."):
+                stage = metric.split(".", 1)[1]
+                new_value, old_value = result["allocations"][stage], old.get("allocations", {}).get(stage)
+            else:
+                new_value, old_value = result.get(metric), old.get(metric)
+            if not old_value or new_value is None:
+                continue
+            change = (new_value - old_value) / old_value
+            worse = -change if higher_is_better else change
+            flag = " !" if worse > threshold else ""
+            if flag:
+                regressions.append((result["scenario"], metric, change))
+            print(f"{result['scenario']:<40} {metric:<20} {old_value:>10.4g} {new_value:>10.4g} {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000", help="page sizes in KB, comma separated (up to 20000)")
+    parser.add_argument("--kinds", default="listing,links,images,nested")
+    parser.add_argument("--tag-types", default=",".join(TAG_TYPES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--ai", action="store_true", help="run the LLM path with the stub model")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds per stub LLM call")
+    parser.add_argument("--proxies", choices=["none", "slow", "dead", "mixed"], default="none")
+    parser.add_argument("--proxy-delay", type=float, default=0.2, help="seconds added by the slow proxy")
+    parser.add_argument("--proxy-timeout", type=float, default=1.0, help="proxy pool timeout (dead proxies hang until it)")
+    parser.add_argument("--no-alloc", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--output", help="results file (default benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+    args = parser.parse_args(argv)
+
+    kinds = [k for k in args.kinds.split(",") if k]
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    tag_types = [t for t in args.tag_types.split(",") if t]
+
+    results = []
+    with FixtureServer() as fixture:
+        proxies = setup(fixture, args)
+        try:
+            print(f"{'scenario':<40} {'pages/s':>8} {'MB/s':>8} {'p50':>9} {'p95':>9} {'RSS MB':>8}")
+            for kind in kinds:
+                for size_kb in sizes:
+                    for tag_type in tag_types:
+                        result = run_scenario(fixture, kind, size_kb, tag_type, args)
+                        results.append(result)
+                        print(f"{result['scenario']:<40} {result['throughput_pages_s']:>8.2f} {result['throughput_mb_s']:>8.2f} "
+                              f"{result['latency_p50']:>8.4f}s {result['latency_p95']:>8.4f}s {result['peak_rss_mb'] or 0:>8.1f}")
+        finally:
+            for proxy in proxies:
+                proxy.stop()
+
+    output = args.output or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    payload = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""
+Offline fixtures for the benchmarks - generated pages served from a local HTTP server,
+stub proxies (slow / dead) and a stub LLM with configurable latency.
+
+Pages are addressed as /<kind>/<size_kb>.html, kinds: listing, links, images, nested.
+Recorded pages dropped into benchmarks/pages/ are served as /recorded/<file name>.
+"""
+import os
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from bench_parsers import generate_page
+
+RECORDED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pages")
+
+
+def _fill(size_kb, head, make_block, tail="</body></html>"):
+    parts = [head]
+    size = len(head)
+    i = 0
+    while size < size_kb * 1024:
+        block = make_block(i)
+        parts.append(block)
+        size += len(block)
+        i += 1
+    parts.append(tail)
+    return "".join(parts)
+
+
+def generate_link_page(size_kb):
+    """Navigation / sitemap style page - mostly <a> elements"""
+    return _fill(
+        size_kb, "<html><head><title>Links</title></head><body><h1>Index</h1><ul>",
+        lambda i: f'<li><a href="/section/{i % 50}/page-{i}">Article number {i}</a> <a href="https://example.org/{i}">mirror</a></li>\n',
+        "</ul></body></html>",
+    )
+
+
+def generate_image_page(size_kb):
+    """Gallery page - mostly <img> elements with captions"""
+    return _fill(
+        size_kb, "<html><head><title>Gallery</title></head><body><h1>Gallery</h1>",
+        lambda i: f'<figure><img src="/img/{i}.jpg" alt="Photo {i}" width="320" height="240"><figcaption>Photo {i}</figcaption></figure>\n',
+    )
+
+
+def generate_nested_page(size_kb, depth=60):
+    """Deeply nested markup - each section is `depth` wrapper divs around a little content"""
+    def section(i):
+        opening = "".join(f'<div class="level-{d}">' for d in range(depth))
+        return f"{opening}<h2>Section {i}</h2><p>Nested paragraph {i} <span>inline</span></p>{'</div>' * depth}\n"
+    return _fill(size_kb, "<html><head><title>Nested</title></head><body>", section)
+
+
+GENERATORS = {
+    "listing": generate_page,
+    "links": generate_link_page,
+    "images": generate_image_page,
+    "nested": generate_nested_page,
+}
+
+
+class FixtureServer:
+    """
+    Local HTTP server for benchmark pages (generated once, kept in memory)
+    Add ?delay=<seconds> to any URL to simulate a slow origin.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self._pages = {}
+        self._lock = threading.Lock()
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # headers and body are separate writes
+
+            def do_GET(self):
+                fixture._respond(self, self.path)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.host, self.port = self.server.server_address[:2]
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fixture-server", daemon=True)
+
+    def url(self, kind, size_kb):
+        return f"http://{self.host}:{self.port}/{kind}/{size_kb}.html"
+
+    def page(self, path):
+        """Body for a request path, or None"""
+        path = urlparse(path).path
+        with self._lock:
+            if path in self._pages:
+                return self._pages[path]
+        parts = path.strip("/").split("/")
+        if len(parts) != 2:
+            return None
+        kind, name = parts
+        if kind == "recorded":
+            file_path = os.path.join(RECORDED_DIR, os.path.basename(name))
+            if not os.path.exists(file_path):
+                return None
+            with open(file_path, "rb") as f:
+                body = f.read()
+        elif kind in GENERATORS and name.endswith(".html") and name[:-5].isdigit():
+            body = GENERATORS[kind](int(name[:-5])).encode("utf-8")
+        else:
+            return None
+        with self._lock:
+            self._pages[path] = body
+        return body
+
+    def _respond(self, handler, path):
+        query = urlparse(path).query
+        if query.startswith("delay="):
+            time.sleep(float(query.split("=", 1)[1]))
+        body = self.page(path)
+        if body is None:
+            handler.send_error(404)
+            return
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/html; charset=utf-8")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class StubProxy:
+    """
+    Forward proxy that answers from a FixtureServer after `delay` seconds (no real network)
+    dead=True accepts connections but never answers, so clients run into their timeout
+    """
+
+    def __init__(self, fixture, delay=0.0, dead=False, host="127.0.0.1"):
+        self.fixture = fixture
+        self.delay = delay
+        self.dead = dead
+        if dead:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._socket.bind((host, 0))
+            self._socket.listen(64)
+            self.host, self.port = self._socket.getsockname()
+            self.server = None
+            return
+
+        proxy = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # headers and body are separate writes
+
+            def do_GET(self):
+                time.sleep(proxy.delay)
+                proxy.fixture._respond(self, self.path)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, 0), Handler)
+        self.server.daemon_threads = True
+        self.host, self.port = self.server.server_address[:2]
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        if self.server is not None:
+            threading.Thread(target=self.server.serve_forever, name="stub-proxy", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        else:
+            self._socket.close()
+
+
+def make_stub_llm(latency=0.0, items=5):
+    """
+    LangChain chat model that sleeps `latency` seconds per call and answers with
+    the first `items` non-empty lines of the content it was given
+    """
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    class StubLLM(FakeListChatModel):
+        latency: float = 0.0
+        items: int = 5
+
+        def _call(self, messages, stop=None, run_manager=None, **kwargs):
+            time.sleep(self.latency)
+            text = messages[-1].content if messages else ""
+            content = text.split("From this content:", 1)[-1].split("Requirements:", 1)[0]
+            lines = [line.strip() for line in content.splitlines() if line.strip()]
+            return "\n".join(lines[:self.items])
+
+    return StubLLM(responses=[""], latency=latency, items=items)
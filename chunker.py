@@ -0,0 +1,209 @@
+from collections import namedtuple
+
+from bs4 import CData, NavigableString, Tag
+
+# tiktoken gives real token counts; without it we fall back to ~4 characters per token
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+MAX_CHUNK_TOKENS = 1500   # prompt budget for the page content of one LLM call
+MAX_BLOCK_TOKENS = 300    # DOM blocks up to this size are never split
+OVERLAP_TOKENS = 0        # tokens of trailing blocks repeated at the start of the next chunk
+MAX_CHARS_PER_TOKEN = 10  # text longer than budget x this is over budget without tokenizing (~4 is typical)
+
+# Never holds the data we are after
+BOILERPLATE_TAGS = {"script", "style", "noscript", "template", "iframe", "svg"}
+# Page furniture - dropped only as top-level landmarks (see _is_boilerplate)
+LANDMARK_TAGS = {"nav", "footer", "header", "aside"}
+BOILERPLATE_ROLES = {"navigation", "banner", "contentinfo", "search", "menu", "menubar"}
+SECTIONING_TAGS = {"article", "main", "section"}  # a header/footer inside these belongs to the content
+MAX_BOILERPLATE_SHARE = 0.5  # a landmark holding more of the body text than this is the content
+
+# Elements that form a self-contained unit (a product card, a table row, a list item ...)
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "body", "dd", "details", "div", "dl", "dt", "fieldset",
+    "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "li", "main",
+    "nav", "ol", "p", "pre", "section", "table", "tbody", "td", "tfoot", "th", "thead", "tr", "ul",
+}
+
+Block = namedtuple("Block", ["path", "text"])
+
+_encoders = {}
+
+
+def _encoder(model_name):
+    if tiktoken is None:
+        return None
+    if model_name not in _encoders:
+        try:
+            _encoders[model_name] = tiktoken.encoding_for_model(model_name or "")
+        except KeyError:
+            # Open models (llama, mixtral ...) are close enough to cl100k for budgeting
+            _encoders[model_name] = tiktoken.get_encoding("cl100k_base")
+    return _encoders[model_name]
+
+
+def count_tokens(text, model_name=None):
+    """Token count of `text` for `model_name`"""
+    encoder = _encoder(model_name)
+    if encoder is None:
+        return len(text) // 4 + 1
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+def _split_long(text, model_name, max_tokens):
+    """Split a single oversized block into pieces of at most max_tokens"""
+    encoder = _encoder(model_name)
+    if encoder is None:
+        size = max_tokens * 4
+        return [(text[i:i + size], max_tokens) for i in range(0, len(text), size)]
+    ids = encoder.encode(text, disallowed_special=())
+    return [(encoder.decode(ids[i:i + max_tokens]), len(ids[i:i + max_tokens])) for i in range(0, len(ids), max_tokens)]
+
+
+def _is_main(tag):
+    return tag.name == "main" or tag.get("role") == "main"
+
+
+def _is_boilerplate(tag, in_section, body_chars):
+    """
+    script/style/... always; nav/header/footer/aside (or their ARIA roles) only as top-level
+    page furniture - not inside article/section/main, not wrapping <main>, not most of the page text
+    """
+    if tag.name in BOILERPLATE_TAGS:
+        return True
+    if tag.name not in LANDMARK_TAGS and tag.get("role") not in BOILERPLATE_ROLES:
+        return False
+    if in_section or tag.find(_is_main) is not None:
+        return False
+    return len(tag.get_text(" ", strip=True)) <= MAX_BOILERPLATE_SHARE * body_chars()
+
+
+def extract_blocks(soup, model_name=None, max_block_tokens=MAX_BLOCK_TOKENS, drop_repeated=False):
+    """
+    Split a parsed page into text blocks that follow the DOM structure
+    - script/style/... and top-level nav/footer/header/aside landmarks are dropped
+    - a block element whose text fits in max_block_tokens is kept whole, bigger ones are split into their children
+    - drop_repeated=True keeps only the first of blocks with identical text (off by default:
+      repeated rows of a listing or table are usually the data)
+    Returns a list of Block(path, text), path is a stable DOM position like "body/div[2]/ul[0]/li[3]"
+    """
+    blocks = []
+    seen = set()
+    body_size = []
+    counts = {}
+
+    def fits(text):
+        """count_tokens(text) <= max_block_tokens, tokenizing only when the length does not decide it"""
+        if len(text) <= max_block_tokens and len(text.encode("utf-8")) <= max_block_tokens:
+            return True  # at most one token per byte
+        if len(text) > max_block_tokens * MAX_CHARS_PER_TOKEN:
+            return False
+        # Nested wrappers often share the same text - tokenize it once
+        if text not in counts:
+            counts[text] = count_tokens(text, model_name)
+        return counts[text] <= max_block_tokens
+
+    def body_chars():
+        if not body_size:
+            body_size.append(len(root.get_text(" ", strip=True)))
+        return body_size[0]
+
+    def add(path, text):
+        if drop_repeated:
+            if text in seen:
+                return
+            seen.add(text)
+        blocks.append(Block(path, text))
+
+    def walk(node, path, in_section=False):
+        inline = []
+
+        def flush():
+            if inline:
+                add(path, " ".join(inline))
+                inline.clear()
+
+        index = 0
+        for child in node.children:
+            if isinstance(child, NavigableString):
+                if type(child) in (NavigableString, CData) and child.strip():
+                    inline.append(child.strip())
+                continue
+            if not isinstance(child, Tag):
+                continue
+
+            child_path = f"{path}/{child.name}[{index}]"
+            index += 1
+            if _is_boilerplate(child, in_section, body_chars):
+                continue
+
+            text = child.get_text(" ", strip=True)
+            if not text:
+                continue
+            if child.name not in BLOCK_TAGS:
+                inline.append(text)  # inline markup is part of the surrounding text
+                continue
+
+            flush()
+            if fits(text):
+                add(child_path, text)
+            else:
+                walk(child, child_path, in_section or child.name in SECTIONING_TAGS or _is_main(child))
+        flush()
+
+    root = soup.body or soup
+    walk(root, root.name or "document")
+    return blocks
+
+
+def chunk_blocks(texts, model_name=None, max_tokens=None, overlap_tokens=None):
+    """
+    Pack texts (blocks or lines) into chunks of at most max_tokens tokens
+    Blocks are never split unless a single block is larger than a whole chunk.
+    The last overlap_tokens worth of blocks are repeated at the start of the next chunk.
+    """
+    max_tokens = max_tokens or MAX_CHUNK_TOKENS
+    overlap_tokens = OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+
+    chunks = []
+    current = []  # (text, tokens)
+    current_tokens = 0
+
+    for text in texts:
+        text = text.text if isinstance(text, Block) else text
+        if not text:
+            continue
+        tokens = count_tokens(text, model_name)
+        pieces = _split_long(text, model_name, max_tokens) if tokens > max_tokens else [(text, tokens)]
+
+        for piece, piece_tokens in pieces:
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append("\n".join(t for t, _ in current))
+
+                # Carry the tail of this chunk over as context for the next one
+                carry = []
+                carried = 0
+                for prev, prev_tokens in reversed(current):
+                    if carried + prev_tokens > overlap_tokens:
+                        break
+                    carry.insert(0, (prev, prev_tokens))
+                    carried += prev_tokens
+                if carried + piece_tokens > max_tokens:
+                    carry, carried = [], 0
+                current, current_tokens = carry, carried
+
+            current.append((piece, piece_tokens))
+            current_tokens += piece_tokens
+
+    if current:
+        chunks.append("\n".join(t for t, _ in current))
+    return chunks
+
+
+def chunk_page(soup, model_name=None, max_tokens=None, overlap_tokens=None):
+    """Boilerplate-free, structure-aware chunks for a parsed page"""
+    blocks = extract_blocks(soup, model_name=model_name)
+    return chunk_blocks(blocks, model_name=model_name, max_tokens=max_tokens, overlap_tokens=overlap_tokens)
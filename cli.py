@@ -0,0 +1,188 @@
+"""
+Headless command line for Web Harvester
+
+    python cli.py run job.json [--output-dir out] [--parallelism 8] [--format parquet]
+    python cli.py scrape https://example.com --tag-type links --limit 100 --format csv
+    python cli.py run job.json --metrics-port 9108   # Prometheus /metrics while the job runs
+    python cli.py run job.json --doc-cache-mb 64     # parsed-page cache budget (MB of HTML, default 16)
+
+Distributed runs through a durable queue (SQLite file or redis://...):
+
+    python cli.py submit job.json --queue crawl.sqlite
+    python cli.py work catalog.products --queue crawl.sqlite --output-dir out   # on every worker
+    python cli.py status --queue crawl.sqlite
+    python cli.py export catalog.products out/products.parquet --queue crawl.sqlite --output-dir out
+
+Prints a JSON summary (timings, pages, rows, outputs) to stdout.
+"""
+import argparse
+import contextlib
+import json
+import sys
+
+from job_queue import export_job, open_queue, run_worker, submit_task
+from doc_cache import configure_document_cache
+from jobs import _task_name, load_job, run_job
+from metrics import serve_metrics
+
+
+def _run(job, args):
+    server = serve_metrics(args.metrics_port) if args.metrics_port else None
+    try:
+        # Progress / error messages go to stderr so stdout stays pure JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            return run_job(job, output_dir=args.output_dir, parallelism=args.parallelism, fmt=args.format)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+
+def _cmd_run(args):
+    job = load_job(args.job)
+    summary = _run(job, args)
+    print(json.dumps(summary, indent=2))
+    return 0 if summary["ok"] else 1
+
+
+def _cmd_scrape(args):
+    # One-off job built from the command line
+    task = {
+        "name": args.name,
+        "urls": args.urls,
+        "tag_type": args.tag_type,
+        "limit": args.limit,
+        "custom_tag": args.custom_tag,
+        "parse_text": args.parse_text,
+        "use_proxies": args.use_proxies,
+        "download_images": args.download_images,
+        "process_workers": args.process_workers,
+    }
+    job = {"name": args.name, "tasks": [task]}
+    summary = _run(job, args)
+    print(json.dumps(summary, indent=2))
+    return 0 if summary["ok"] else 1
+
+
+def _cmd_submit(args):
+    job = load_job(args.job)
+    queue = open_queue(args.queue, shards=args.shards)
+    defaults = job.get("defaults", {})
+    tasks = job.get("tasks") or [{"urls": job.get("urls", [])}]
+    submitted = {}
+    for index, task in enumerate(tasks, 1):
+        name = f"{job['name']}.{_task_name(task, index)}"
+        submitted[name] = submit_task(queue, name, {**defaults, **task})
+    print(json.dumps({"queue": args.queue, "jobs": submitted}, indent=2))
+    return 0
+
+
+def _cmd_work(args):
+    queue = open_queue(args.queue, shards=args.shards)
+    names = args.jobs or queue.jobs()
+    summaries = []
+    with contextlib.redirect_stdout(sys.stderr):
+        for name in names:
+            summary = run_worker(queue, name, output_dir=args.output_dir or "jobs_output", worker=args.worker,
+                                 lease_seconds=args.lease_seconds, shard=args.shard, idle_timeout=args.idle_timeout,
+                                 max_tasks=args.max_tasks)
+            summaries.append({"job": name, **summary})
+    print(json.dumps(summaries, indent=2))
+    return 0
+
+
+def _cmd_status(args):
+    queue = open_queue(args.queue, shards=args.shards)
+    status = {}
+    for name in args.jobs or queue.jobs():
+        status[name] = queue.stats(name)
+        if args.dead:
+            status[name]["dead_letters"] = queue.dead_letters(name)
+    print(json.dumps(status, indent=2))
+    return 0
+
+
+def _cmd_export(args):
+    queue = open_queue(args.queue, shards=args.shards)
+    if args.requeue_dead:
+        print(json.dumps({"requeued": queue.requeue_dead(args.job_name)}, indent=2))
+        return 0
+    if not args.path:
+        raise SystemExit("export needs an output path")
+    result = export_job(queue, args.job_name, args.output_dir or "jobs_output", args.path, fmt=args.format)
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run a JSON job file")
+    run.add_argument("job", help="path to the job file")
+    run.set_defaults(func=_cmd_run)
+
+    scrape = commands.add_parser("scrape", help="scrape URLs given on the command line")
+    scrape.add_argument("urls", nargs="+")
+    scrape.add_argument("--name", default="scrape")
+    scrape.add_argument("--tag-type", default="alltext",
+                        choices=["alltext", "headings", "paragraphs", "links", "customtag", "images"])
+    scrape.add_argument("--limit", type=int, default=50)
+    scrape.add_argument("--custom-tag")
+    scrape.add_argument("--parse-text", help="AI extraction prompt (needs GROQ_API_KEY)")
+    scrape.add_argument("--use-proxies", action="store_true")
+    scrape.add_argument("--download-images", action="store_true")
+    scrape.add_argument("--process-workers", type=int, help="parse/extract in this many worker processes")
+    scrape.set_defaults(func=_cmd_scrape)
+
+    for command in (run, scrape):
+        command.add_argument("--output-dir", help="where outputs and summary.json are written")
+        command.add_argument("--parallelism", type=int, help="pages fetched concurrently")
+        command.add_argument("--format", choices=["parquet", "arrow", "jsonl", "csv"])
+        command.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this port while running")
+
+    submit = commands.add_parser("submit", help="enqueue a job file's tasks on the work queue")
+    submit.add_argument("job", help="path to the job file")
+    submit.set_defaults(func=_cmd_submit)
+
+    work = commands.add_parser("work", help="process queued tasks (run one per worker process / machine)")
+    work.add_argument("jobs", nargs="*", help="queue job names (default: all)")
+    work.add_argument("--output-dir", help="where part files are written")
+    work.add_argument("--worker", help="worker id (default: host-pid-random)")
+    work.add_argument("--shard", type=int, help="only take hosts of this shard (0 .. shards-1)")
+    work.add_argument("--lease-seconds", type=float, default=120)
+    work.add_argument("--idle-timeout", type=float, default=30, help="stop after this long without available tasks")
+    work.add_argument("--max-tasks", type=int)
+    work.set_defaults(func=_cmd_work)
+
+    for command in (run, scrape, work):
+        command.add_argument("--doc-cache-mb", type=float,
+                             help="parsed-page cache budget in MB of HTML (trees take ~10x that; default 16)")
+
+    status = commands.add_parser("status", help="task counts per queue job")
+    status.add_argument("jobs", nargs="*")
+    status.add_argument("--dead", action="store_true", help="list dead-lettered tasks")
+    status.set_defaults(func=_cmd_status)
+
+    export = commands.add_parser("export", help="merge a queue job's part files into one output")
+    export.add_argument("job_name")
+    export.add_argument("path", nargs="?", help="output file (format from --format or the extension)")
+    export.add_argument("--output-dir", help="where the part files were written")
+    export.add_argument("--format", choices=["parquet", "arrow", "jsonl", "csv"])
+    export.add_argument("--requeue-dead", action="store_true", help="retry dead-lettered tasks instead of exporting")
+    export.set_defaults(func=_cmd_export)
+
+    for command in (submit, work, status, export):
+        command.add_argument("--queue", default=".job_queue.sqlite", help="SQLite file or redis:// URL")
+        command.add_argument("--shards", type=int, default=1, help="number of host shards (same on every worker)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if getattr(args, "doc_cache_mb", None) is not None:
+        configure_document_cache(max_bytes=int(args.doc_cache_mb * 1024 * 1024))
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
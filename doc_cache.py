@@ -0,0 +1,114 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from bs4 import BeautifulSoup
+
+from metrics import inc, span
+
+# lxml is much faster than the pure-Python "html.parser"; fall back when it isn't installed
+try:
+    import lxml  # noqa: F401
+    DEFAULT_PARSER = "lxml"
+except ImportError:
+    DEFAULT_PARSER = "html.parser"
+
+# Bounds of the shared cache - both apply. Parsed trees take roughly 10x the HTML size
+# in memory, so the default byte budget (16 MB of HTML) keeps the cache near 150-250 MB.
+DOCUMENT_CACHE_DOCUMENTS = 32
+DOCUMENT_CACHE_BYTES = 16 * 1024 * 1024
+
+
+class DocumentCache:
+    """
+    LRU cache of parsed pages keyed by (content hash, parser)
+    Bounded by document count and by `max_bytes` of HTML input (pages larger than that are parsed but not kept)
+    The cached trees are shared - extraction code must only read from them, never modify them
+    """
+
+    def __init__(self, max_documents=None, max_bytes=None):
+        self.max_documents = max_documents or DOCUMENT_CACHE_DOCUMENTS
+        self.max_bytes = DOCUMENT_CACHE_BYTES if max_bytes is None else max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+        self._documents = OrderedDict()  # key -> (soup, input bytes)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _data(html):
+        return html.encode("utf-8", errors="replace") if isinstance(html, str) else html
+
+    @classmethod
+    def content_hash(cls, html):
+        return hashlib.sha1(cls._data(html)).hexdigest()
+
+    def parse(self, html, parser=None):
+        """Return the parsed tree for `html`, parsing it only on the first request"""
+        parser = parser or DEFAULT_PARSER
+        data = self._data(html)
+        key = (hashlib.sha1(data).hexdigest(), parser)
+
+        with self._lock:
+            entry = self._documents.get(key)
+            if entry is not None:
+                soup = entry[0]
+                self._documents.move_to_end(key)
+                self.hits += 1
+                inc("cache_requests", cache="document", result="hit")
+                return soup
+            self.misses += 1
+        inc("cache_requests", cache="document", result="miss")
+
+        with span("parse", parser=parser):
+            soup = BeautifulSoup(html, parser)
+
+        size = len(data)
+        if size > self.max_bytes:
+            return soup
+        with self._lock:
+            if key not in self._documents:
+                self._documents[key] = (soup, size)
+                self.bytes += size
+            self._evict()
+        return soup
+
+    def _evict(self):
+        while self._documents and (len(self._documents) > self.max_documents or self.bytes > self.max_bytes):
+            _, (_, size) = self._documents.popitem(last=False)
+            self.bytes -= size
+
+    def resize(self, max_documents=None, max_bytes=None):
+        """Change the bounds, evicting right away if the cache is now over them"""
+        with self._lock:
+            if max_documents is not None:
+                self.max_documents = max_documents
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            self._evict()
+
+    def stats(self):
+        return {"documents": len(self._documents), "bytes": self.bytes, "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+            self.bytes = 0
+            self.hits = self.misses = 0
+
+
+_cache = DocumentCache()
+
+
+def parse_document(html, parser=None):
+    """Parse `html` through the shared document cache"""
+    return _cache.parse(html, parser)
+
+
+def get_document_cache():
+    return _cache
+
+
+def configure_document_cache(max_documents=None, max_bytes=None):
+    """Set the shared cache's bounds (max_bytes counts HTML input, see DOCUMENT_CACHE_BYTES)"""
+    _cache.resize(max_documents=max_documents, max_bytes=max_bytes)
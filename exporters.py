@@ -0,0 +1,291 @@
+import io
+import os
+import threading
+import warnings
+import zipfile
+
+# Formats that are already compressed - deflating them again only costs CPU
+STORED_EXTENSIONS = {
+    ".jpg", ".jpeg", ".png", ".webp", ".gif", ".avif", ".heic",
+    ".zip", ".gz", ".bz2", ".xz", ".7z", ".mp3", ".mp4", ".webm", ".woff", ".woff2",
+}
+
+
+class ZipBuilder:
+    """
+    Incremental ZIP archive - files are added as they become available (thread-safe)
+    Writes into memory by default, or into any binary file object / path given as `target`.
+    Already-compressed formats are stored, everything else is deflated.
+    """
+
+    def __init__(self, target=None):
+        self._owns_target = isinstance(target, str)
+        if target is None:
+            target = io.BytesIO()
+        elif self._owns_target:
+            target = open(target, "wb")
+        self.target = target
+        self._zip = zipfile.ZipFile(target, "w")
+        self._lock = threading.Lock()
+        self._paths = set()
+        self._names = set()
+        self.count = 0
+
+    def _arcname(self, name):
+        base, ext = os.path.splitext(name)
+        counter = 1
+        while name in self._names:
+            name = f"{base}_{counter}{ext}"
+            counter += 1
+        self._names.add(name)
+        return name
+
+    def add_file(self, path, arcname=None):
+        """Add a file from disk (the same path is only added once)"""
+        if not path or not os.path.exists(path):
+            return
+        ext = os.path.splitext(path)[1].lower()
+        compress_type = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+        with self._lock:
+            if path in self._paths:
+                return
+            self._paths.add(path)
+            self._zip.write(path, self._arcname(arcname or os.path.basename(path)), compress_type=compress_type)
+            self.count += 1
+
+    def add_bytes(self, name, data):
+        ext = os.path.splitext(name)[1].lower()
+        compress_type = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+        with self._lock:
+            self._zip.writestr(self._arcname(name), data, compress_type=compress_type)
+            self.count += 1
+
+    def close(self):
+        """Finish the archive - returns the bytes when building in memory, otherwise None"""
+        with self._lock:
+            self._zip.close()
+        if isinstance(self.target, io.BytesIO):
+            return self.target.getvalue()
+        if self._owns_target:
+            self.target.close()
+        return None
+
+
+# --- Tabular result writers ---
+
+EXPORT_FORMATS = ("parquet", "arrow", "jsonl", "csv")
+_EXTENSIONS = {
+    ".parquet": "parquet", ".pq": "parquet",
+    ".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow",
+    ".jsonl": "jsonl", ".ndjson": "jsonl",
+    ".csv": "csv",
+}
+
+
+class ResultWriter:
+    """
+    Base class for incremental writers - call write(df) once per page/batch, then close()
+    Usable as a context manager. `rows` counts everything written so far.
+    """
+
+    fmt = None
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def write(self, df):
+        if df is None or df.empty:
+            return
+        self._write(df)
+        self.rows += len(df)
+
+    def _write(self, df):
+        raise NotImplementedError
+
+    def flush(self):
+        """Push buffered rows to disk (checkpointing) - formats with a footer only become readable on close()"""
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _ArrowWriter(ResultWriter):
+    """
+    Shared schema handling for the pyarrow based writers
+    The first batch fixes the columns. Columns that are still all-null keep the file from being
+    opened (batches are buffered, up to MAX_PENDING_ROWS) until a batch shows their real type;
+    whatever is still null then becomes string. Later batches are cast to the schema column by
+    column - values that cannot be cast become null (with a warning) instead of failing the export.
+    """
+
+    MAX_PENDING_ROWS = 10000
+
+    def __init__(self, path):
+        super().__init__(path)
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError(f"pyarrow is required for {self.fmt} export (pip install pyarrow)")
+        self.pa = pyarrow
+        self.schema = None
+        self._writer = None
+        self._pending = []
+        self._pending_rows = 0
+
+    def _write(self, df):
+        table = self.pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is not None:
+            self._writer.write_table(self._conform(table))
+            return
+        self._pending.append(table)
+        self._pending_rows += table.num_rows
+        fields = self._pending_fields()
+        if self._pending_rows >= self.MAX_PENDING_ROWS or not any(self.pa.types.is_null(f.type) for f in fields):
+            self._open_pending(fields)
+
+    def _pending_fields(self):
+        """First batch's columns, null types filled in from later batches, categoricals as their value type"""
+        pa = self.pa
+        first, later = self._pending[0].schema, [t.schema for t in self._pending[1:]]
+        fields = []
+        for field in first:
+            for schema in later:
+                if pa.types.is_null(field.type) and field.name in schema.names:
+                    field = schema.field(field.name)
+            if pa.types.is_dictionary(field.type):
+                field = pa.field(field.name, field.type.value_type)
+            fields.append(field)
+        return fields
+
+    def _open_pending(self, fields):
+        pa = self.pa
+        fields = [pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in fields]
+        self.schema = pa.schema(fields, metadata=self._pending[0].schema.metadata)
+        self._writer = self._open(self.schema)
+        for table in self._pending:
+            self._writer.write_table(self._conform(table))
+        self._pending, self._pending_rows = [], 0
+
+    def _conform(self, table):
+        """Cast a batch to the file schema (missing columns become null, extra ones are dropped)"""
+        pa = self.pa
+        extra = [name for name in table.column_names if name not in self.schema.names]
+        if extra:
+            warnings.warn(f"Dropping columns not in the {self.fmt} schema: {', '.join(map(str, extra))}", RuntimeWarning)
+        columns = []
+        for field in self.schema:
+            if field.name not in table.column_names:
+                columns.append(pa.nulls(table.num_rows, field.type))
+                continue
+            column = table.column(field.name)
+            if column.type != field.type:
+                try:
+                    column = column.cast(field.type, safe=False)
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+                    warnings.warn(f"Column {field.name!r} holds {column.type}, not {field.type} - written as null", RuntimeWarning)
+                    column = pa.nulls(table.num_rows, field.type)
+            columns.append(column)
+        return pa.Table.from_arrays(columns, schema=self.schema)
+
+    def _open(self, schema):
+        raise NotImplementedError
+
+    def close(self):
+        if self._writer is None and self._pending:
+            self._open_pending(self._pending_fields())
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class ParquetWriter(_ArrowWriter):
+    """Parquet file, one row group per write()"""
+
+    fmt = "parquet"
+
+    def _open(self, schema):
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(self.path, schema, compression="zstd")
+
+
+class ArrowWriter(_ArrowWriter):
+    """Arrow IPC file (Feather v2), one record batch per write()"""
+
+    fmt = "arrow"
+
+    def _open(self, schema):
+        import pyarrow.ipc
+        return pyarrow.ipc.new_file(self.path, schema)
+
+
+class JsonLinesWriter(ResultWriter):
+    """Newline-delimited JSON, appended per write()"""
+
+    fmt = "jsonl"
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._file = open(path, "w", encoding="utf-8")
+
+    def _write(self, df):
+        text = df.to_json(orient="records", lines=True, force_ascii=False)
+        self._file.write(text if text.endswith("\n") else text + "\n")
+
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def tell(self):
+        return self._file.tell()
+
+    def truncate(self, offset):
+        """Drop everything written after `offset` (from tell()) - e.g. rows whose task could not be acked"""
+        self._file.seek(offset)
+        self._file.truncate()
+        self.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class CsvWriter(ResultWriter):
+    """CSV with the header taken from the first write()"""
+
+    fmt = "csv"
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._file = open(path, "w", encoding="utf-8", newline="")
+        self.columns = None
+
+    def _write(self, df):
+        if self.columns is None:
+            self.columns = list(df.columns)
+            df.to_csv(self._file, index=False)
+        else:
+            df.reindex(columns=self.columns).to_csv(self._file, index=False, header=False)
+
+    def close(self):
+        self._file.close()
+
+
+WRITERS = {"parquet": ParquetWriter, "arrow": ArrowWriter, "jsonl": JsonLinesWriter, "csv": CsvWriter}
+
+
+def open_writer(path, fmt=None):
+    """Open an incremental writer for `path` (format from `fmt` or the file extension)"""
+    fmt = fmt or _EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format for {path!r} (use one of {', '.join(EXPORT_FORMATS)})")
+    return WRITERS[fmt](path)
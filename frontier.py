@@ -0,0 +1,384 @@
+"""
+URL frontier for crawls
+- canonicalize_url: one spelling per page (relative hrefs, dot segments, #fragments, tracking params, host case, default ports)
+- BloomFilter in memory in front of an exact on-disk seen set, so memory stays bounded
+- Frontier: on-disk priority queue - shallow pages first, hosts interleaved
+- iter_sitemap / sitemaps_from_robots: streaming sitemap (and sitemap index) discovery
+"""
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+import zlib
+from urllib.parse import quote, quote_plus, unquote_plus, urlencode, urljoin, urlparse, urlunparse
+from urllib.robotparser import RobotFileParser
+
+from async_fetch import polite_call
+from http_session import get_session
+
+# Query parameters that only track the visitor and never change the page
+TRACKING_PARAMS = {"gclid", "dclid", "fbclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid", "_ga", "_gl", "ref_src"}
+TRACKING_PREFIXES = ("utm_", "pk_", "mtm_")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+DEPTH_WEIGHT = 1000  # priority cost of one link hop - a page one hop deeper waits behind 1000 pages of another host
+BLOOM_CAPACITY = 1000000
+BLOOM_ERROR_RATE = 0.001
+
+_PERCENT_RE = re.compile(r"%[0-9a-fA-F]{2}")
+_UNRESERVED = set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+
+
+def _normalize_escapes(text):
+    """Upper-case percent escapes and decode the ones that encode unreserved characters"""
+    def fix(match):
+        char = chr(int(match.group()[1:], 16))
+        return char if char in _UNRESERVED else match.group().upper()
+    return _PERCENT_RE.sub(fix, text)
+
+
+def _remove_dot_segments(path):
+    """RFC 3986 5.2.4 - /a/./b/../c/ -> /a/c/ (empty segments and the trailing slash are kept)"""
+    segments = path.split("/")[1:]
+    if "." not in segments and ".." not in segments:
+        return path
+    output = []
+    for segment in segments:
+        if segment == "..":
+            if output:
+                output.pop()
+        elif segment != ".":
+            output.append(segment)
+    if segments[-1] in (".", ".."):
+        output.append("")  # /a/b/.. is the directory /a/
+    return "/" + "/".join(output)
+
+
+def canonicalize_url(url, base=None):
+    """
+    Normalized absolute URL to fetch, or None for non-HTTP links (mailto:, javascript:, ...)
+    - resolved against `base`, dot segments (/a/../b) and fragment removed
+    - scheme / host lower-cased, default port and empty query removed
+    - tracking parameters (utm_*, gclid, fbclid, ...) removed, remaining parameters sorted
+      (a bare ?key stays bare - some servers treat it differently from ?key=)
+    """
+    url = str(url).strip()
+    if base:
+        url = urljoin(base, url)
+    parsed = urlparse(url)
+    scheme = parsed.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parsed.hostname:
+        return None
+
+    host = parsed.hostname.lower().rstrip(".")
+    try:
+        host = host.encode("idna").decode("ascii")
+    except UnicodeError:
+        pass
+    if parsed.port and parsed.port != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{parsed.port}"
+    if parsed.username:
+        host = f"{parsed.username}{':' + parsed.password if parsed.password else ''}@{host}"
+
+    path = _remove_dot_segments(_normalize_escapes(parsed.path) or "/")
+    path = quote(path, safe="/%:@!$&'()*+,;=-._~")
+    params = []
+    for part in parsed.query.split("&"):
+        if not part:
+            continue
+        key, equals, value = part.partition("=")
+        key, value = unquote_plus(key), unquote_plus(value)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES):
+            params.append((key, value, bool(equals)))
+    query = "&".join(urlencode([(key, value)]) if equals else quote_plus(key) for key, value, equals in sorted(params))
+    return urlunparse((scheme, host, path, parsed.params, query, ""))
+
+
+def url_key(url):
+    """Dedup key - canonical URL without a trailing slash (/docs/ and /docs are one page)"""
+    parsed = urlparse(url)
+    path = parsed.path.rstrip("/") or "/"
+    return urlunparse((parsed.scheme, parsed.netloc, path, parsed.params, parsed.query, ""))
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter - `capacity` items at roughly `error_rate` false positives"""
+
+    def __init__(self, capacity=BLOOM_CAPACITY, error_rate=BLOOM_ERROR_RATE):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+
+class Frontier:
+    """
+    Crawl frontier - everything lives in one SQLite file (a temporary one unless `path` is given),
+    only the Bloom filter is kept in memory
+    - push(url, depth, base) canonicalizes, drops URLs seen before (or rejected by `allow` / robots.txt)
+    - pop() returns the next (url, depth): lowest depth first, hosts served round-robin within a depth,
+      and keeps it in progress until done(url)
+    A frontier opened on an existing `path` resumes where the last run stopped - URLs that were
+    still in progress are queued again.
+    """
+
+    def __init__(self, path=None, allow=None, respect_robots=False, user_agent="*",
+                 bloom_capacity=BLOOM_CAPACITY, bloom_error_rate=BLOOM_ERROR_RATE):
+        self._temporary = path is None
+        if path is None:
+            handle, path = tempfile.mkstemp(prefix="frontier-", suffix=".sqlite")
+            os.close(handle)
+        elif os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.allow = allow
+        self.respect_robots = respect_robots
+        self.user_agent = user_agent
+        self._robots = {}
+        self._host_counts = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS queue (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL,
+                depth INTEGER NOT NULL,
+                priority INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS queue_order ON queue (priority, seq);
+            CREATE TABLE IF NOT EXISTS inflight (
+                seq INTEGER PRIMARY KEY,
+                url TEXT NOT NULL UNIQUE,
+                depth INTEGER NOT NULL,
+                priority INTEGER NOT NULL
+            );
+        """)
+        # Popped by the last run but never finished (crash / interrupted crawl) - back in line
+        with self._db:
+            self._db.execute("INSERT INTO queue (seq, url, depth, priority) SELECT seq, url, depth, priority FROM inflight")
+            self._db.execute("DELETE FROM inflight")
+        self.bloom = BloomFilter(bloom_capacity, bloom_error_rate)
+        for (key,) in self._db.execute("SELECT key FROM seen"):
+            self.bloom.add(key)
+        self.bloom_hits = 0   # Bloom said "maybe" - resolved on disk
+        self.duplicates = 0
+
+    def _seen_add(self, key):
+        """True if `key` is new (and records it)"""
+        if key in self.bloom:
+            self.bloom_hits += 1
+            if self._db.execute("SELECT 1 FROM seen WHERE key = ?", (key,)).fetchone():
+                return False
+        self.bloom.add(key)
+        self._db.execute("INSERT OR IGNORE INTO seen VALUES (?)", (key,))
+        return True
+
+    def _robots_allow(self, url):
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        robots = self._robots.get(origin)
+        if robots is None:
+            robots = self._robots[origin] = load_robots(origin)
+        return robots is False or robots.can_fetch(self.user_agent, url)
+
+    def push(self, url, depth=0, base=None):
+        """Queue a URL - returns False if it was a duplicate or not allowed"""
+        url = canonicalize_url(url, base)
+        if url is None or (self.allow and not self.allow(url)):
+            return False
+        if self.respect_robots and not self._robots_allow(url):
+            return False
+        host = urlparse(url).netloc
+        with self._lock:
+            if not self._seen_add(url_key(url)):
+                self.duplicates += 1
+                return False
+            count = self._host_counts.get(host, 0)
+            self._host_counts[host] = count + 1
+            self._db.execute(
+                "INSERT INTO queue (url, depth, priority) VALUES (?, ?, ?)",
+                (url, depth, depth * DEPTH_WEIGHT + min(count, DEPTH_WEIGHT - 1)),
+            )
+        return True
+
+    def push_many(self, urls, depth=0, base=None):
+        added = sum(1 for url in urls if self.push(url, depth, base))
+        self.commit()
+        return added
+
+    def pop(self):
+        """Next (url, depth), or None when the frontier is empty - in progress until done(url)"""
+        with self._lock:
+            row = self._db.execute("SELECT seq, url, depth, priority FROM queue ORDER BY priority, seq LIMIT 1").fetchone()
+            if row is None:
+                return None
+            self._db.execute("INSERT OR REPLACE INTO inflight VALUES (?, ?, ?, ?)", row)
+            self._db.execute("DELETE FROM queue WHERE seq = ?", (row[0],))
+        return row[1], row[2]
+
+    def done(self, url):
+        """A popped URL is finished (scraped or given up on) - commits, so it is not queued again on resume"""
+        with self._lock:
+            self._db.execute("DELETE FROM inflight WHERE url = ?", (url,))
+            self._db.commit()
+
+    def seen(self, url, base=None):
+        url = canonicalize_url(url, base)
+        if url is None:
+            return False
+        key = url_key(url)
+        with self._lock:
+            return key in self.bloom and self._db.execute("SELECT 1 FROM seen WHERE key = ?", (key,)).fetchone() is not None
+
+    def seed_from_sitemaps(self, site_url, depth=1, limit=None):
+        """Queue the page URLs listed in the site's robots.txt sitemaps (or /sitemap.xml) - returns the count added"""
+        added = 0
+        for url in site_sitemap_urls(site_url):
+            if self.push(url, depth):
+                added += 1
+                if added % 1000 == 0:
+                    self.commit()
+                if limit and added >= limit:
+                    break
+        self.commit()
+        return added
+
+    def commit(self):
+        with self._lock:
+            self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM queue").fetchone()[0]
+
+    def stats(self):
+        with self._lock:
+            seen = self._db.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+            queued = self._db.execute("SELECT COUNT(*) FROM queue").fetchone()[0]
+            in_progress = self._db.execute("SELECT COUNT(*) FROM inflight").fetchone()[0]
+        return {"seen": seen, "queued": queued, "in_progress": in_progress, "duplicates": self.duplicates,
+                "bloom_hits": self.bloom_hits, "bloom_bytes": len(self.bloom.bits)}
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+        if self._temporary:
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(self.path + suffix)
+                except OSError:
+                    pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- robots.txt and sitemaps ---
+
+def load_robots(origin):
+    """Parsed robots.txt for an origin, or False when there is none (everything allowed)"""
+    url = f"{origin}/robots.txt"
+    try:
+        # Under the per-host scheduler like every other request of the crawl
+        response = polite_call(url, get_session(retry=False).get, url, timeout=10, verify=False)
+    except Exception:
+        return False
+    if response.status_code != 200:
+        return False
+    robots = RobotFileParser()
+    robots.parse(response.text.splitlines())
+    return robots
+
+
+def sitemaps_from_robots(origin):
+    """Sitemap URLs declared in robots.txt"""
+    robots = load_robots(origin)
+    return list(robots.site_maps() or []) if robots else []
+
+
+def site_sitemap_urls(site_url):
+    """Page URLs from the site's robots.txt sitemaps, or from /sitemap.xml when robots.txt lists none"""
+    parsed = urlparse(canonicalize_url(site_url) or site_url)
+    origin = f"{parsed.scheme}://{parsed.netloc}"
+    for sitemap in sitemaps_from_robots(origin) or [f"{origin}/sitemap.xml"]:
+        yield from iter_sitemap(sitemap)
+
+
+def _local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def iter_sitemap(url, max_depth=3, _seen=None):
+    """
+    Yield the page URLs of a sitemap, following sitemap indexes up to `max_depth` levels
+    The XML is stream-parsed straight from the response (gzip or plain) and elements are
+    discarded as soon as they are read, so multi-GB sitemaps run in constant memory.
+    """
+    seen = _seen if _seen is not None else set()
+    if url in seen or max_depth < 0:
+        return
+    seen.add(url)
+
+    try:
+        response = polite_call(url, get_session().get, url, timeout=30, verify=False, stream=True)
+        response.raise_for_status()
+    except Exception as e:
+        print(f"Failed to load sitemap {url}: {e}")
+        return
+
+    children = []
+    root = None
+    parser = ET.XMLPullParser(events=("start", "end"))
+    gunzip = None
+    with response:
+        try:
+            # requests undoes Content-Encoding: gzip; .xml.gz files are gzip inside the body
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                if gunzip is None:
+                    gunzip = zlib.decompressobj(16 + zlib.MAX_WBITS) if chunk[:2] == b"\x1f\x8b" else False
+                parser.feed(gunzip.decompress(chunk) if gunzip else chunk)
+                for event, element in parser.read_events():
+                    if event == "start":
+                        if root is None:
+                            root = element
+                        continue
+                    if _local_name(element.tag) != "loc" or not element.text:
+                        if _local_name(element.tag) in ("url", "sitemap"):
+                            root.clear()  # drop finished entries
+                        continue
+                    loc = element.text.strip()
+                    if _local_name(root.tag) == "sitemapindex":
+                        children.append(loc)  # followed after this file is closed
+                    else:
+                        yield loc
+        except (ET.ParseError, zlib.error) as e:
+            print(f"Failed to parse sitemap {url}: {e}")
+
+    for child in children:
+        yield from iter_sitemap(child, max_depth - 1, seen)
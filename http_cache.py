@@ -0,0 +1,191 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+class CachedResponse:
+    """Minimal response object served from the cache (same attributes we use on requests.Response)"""
+
+    status_code = 200
+    from_cache = True
+
+    def __init__(self, url, content, encoding=None, content_type=None):
+        self.url = url
+        self.content = content
+        self.encoding = encoding
+        self.headers = {"Content-Type": content_type} if content_type else {}
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def raise_for_status(self):
+        pass
+
+
+class HttpCache:
+    """
+    Persistent HTTP response cache
+    - bodies live as files in `directory`, metadata in a small SQLite index
+    - entries younger than `ttl` are served from disk without touching the network
+    - older entries are revalidated with If-None-Match / If-Modified-Since (a 304 re-uses the body)
+    - least recently used entries are evicted once the cache grows past `max_bytes`
+    Entries are keyed by URL - every request goes out with the same Accept headers.
+    """
+
+    def __init__(self, directory=".http_cache", ttl=600, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(directory, "bodies"), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite"), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                content_type TEXT,
+                encoding TEXT,
+                size INTEGER,
+                stored_at REAL,
+                accessed_at REAL
+            )
+        """)
+        self._db.commit()
+
+    def key(self, url):
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _body_path(self, key):
+        return os.path.join(self.directory, "bodies", key)
+
+    def lookup(self, url):
+        """Return the cache entry for this request as a dict, or None"""
+        key = self.key(url)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT key, url, etag, last_modified, content_type, encoding, size, stored_at FROM entries WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None or not os.path.exists(self._body_path(key)):
+            return None
+        names = ("key", "url", "etag", "last_modified", "content_type", "encoding", "size", "stored_at")
+        return dict(zip(names, row))
+
+    def is_fresh(self, entry):
+        return time.time() - entry["stored_at"] < self.ttl
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def read(self, entry, revalidated=False):
+        """Load a cached body and mark it as recently used - None (and the entry is dropped) if the body is gone"""
+        try:
+            with open(self._body_path(entry["key"]), "rb") as f:
+                content = f.read()
+        except OSError:
+            # Evicted between lookup() and now - a miss, not an error
+            with self._lock:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (entry["key"],))
+                self._db.commit()
+            return None
+        now = time.time()
+        with self._lock:
+            if revalidated:
+                self._db.execute("UPDATE entries SET accessed_at = ?, stored_at = ? WHERE key = ?", (now, now, entry["key"]))
+            else:
+                self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, entry["key"]))
+            self._db.commit()
+        return CachedResponse(entry["url"], content, entry["encoding"], entry["content_type"])
+
+    def store(self, url, response):
+        """Save a 200 response (skipped when the server says no-store)"""
+        if response.status_code != 200 or "no-store" in response.headers.get("Cache-Control", ""):
+            return
+
+        key = self.key(url)
+        content = response.content
+        content_type = response.headers.get("Content-Type", "")
+        encoding = None
+        if content_type.startswith("text/") or "html" in content_type or "xml" in content_type or "json" in content_type:
+            encoding = response.encoding or response.apparent_encoding
+
+        # Write to a temp file first so readers never see a half-written body
+        path = self._body_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                 content_type, encoding, len(content), now, now),
+            )
+            self._db.commit()
+        self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        with self._lock:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            victims = []
+            for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+                if total <= self.max_bytes:
+                    break
+                victims.append(key)
+                total -= size
+            self._db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in victims])
+            self._db.commit()
+        for key in victims:
+            try:
+                os.remove(self._body_path(key))
+            except OSError:
+                pass
+
+    def get(self, url, send):
+        """
+        Cached GET - `send(extra_headers)` performs the real request and returns a response
+        Returns a CachedResponse (fresh hit or 304) or the live response
+        """
+        entry = self.lookup(url)
+        if entry and self.is_fresh(entry):
+            cached = self.read(entry)
+            if cached is not None:
+                return cached
+            entry = None
+
+        response = send(self.conditional_headers(entry) if entry else {})
+        if entry and response.status_code == 304:
+            cached = self.read(entry, revalidated=True)
+            if cached is not None:
+                return cached
+            response = send({})  # the body was evicted while revalidating - fetch it again
+
+        self.store(url, response)
+        return response
+
+    def clear(self):
+        with self._lock:
+            keys = [row[0] for row in self._db.execute("SELECT key FROM entries")]
+            self._db.execute("DELETE FROM entries")
+            self._db.commit()
+        for key in keys:
+            try:
+                os.remove(self._body_path(key))
+            except OSError:
+                pass
@@ -0,0 +1,82 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# urllib3 only decodes "br" bodies when a brotli module is importable
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = "gzip, deflate, br"
+    except ImportError:
+        ACCEPT_ENCODING = "gzip, deflate"
+
+# Shared session settings - change them with configure_session()
+SESSION_CONFIG = {
+    "pool_connections": 20,   # how many hosts keep a connection pool
+    "pool_maxsize": 20,       # keep-alive connections per host
+    "retries": 3,             # retries for connection errors / retryable statuses
+    "backoff_factor": 0.5,    # sleeps 0.5s, 1s, 2s ... between retries
+    "status_forcelist": (429, 500, 502, 503, 504),
+}
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def build_session(retry=True, **overrides):
+    """Create a requests.Session with pooled keep-alive connections and retry-with-backoff"""
+    config = {**SESSION_CONFIG, **overrides}
+
+    retries = Retry(
+        total=config["retries"] if retry else 0,
+        backoff_factor=config["backoff_factor"],
+        status_forcelist=config["status_forcelist"],
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        raise_on_status=False,  # hand the last response back so raise_for_status() still works
+    )
+    adapter = HTTPAdapter(
+        pool_connections=config["pool_connections"],
+        pool_maxsize=config["pool_maxsize"],
+        max_retries=retries,
+    )
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({
+        "Accept-Encoding": ACCEPT_ENCODING,
+        "Connection": "keep-alive",
+    })
+    return session
+
+
+def get_session(retry=True):
+    """
+    Shared session used by every fetch path
+    retry=False gives a session without retries (for probing proxies that may be dead)
+    """
+    session = _sessions.get(retry)
+    if session is None:
+        with _lock:
+            session = _sessions.get(retry)
+            if session is None:
+                session = _sessions[retry] = build_session(retry=retry)
+    return session
+
+
+def configure_session(**options):
+    """Update SESSION_CONFIG and drop the existing sessions so new settings take effect"""
+    unknown = set(options) - set(SESSION_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown session options: {', '.join(sorted(unknown))}")
+
+    with _lock:
+        SESSION_CONFIG.update(options)
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
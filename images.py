@@ -0,0 +1,175 @@
+import hashlib
+import json
+import mimetypes
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urljoin, urlparse
+
+from async_fetch import polite_call
+from http_session import get_session
+
+CHUNK_SIZE = 64 * 1024
+MANIFEST_NAME = ".manifest.json"
+
+
+class ImageManifest:
+    """
+    Remembers what is already in an output folder (kept as .manifest.json)
+    - urls:   url -> {"path", "sha256", "bytes"}  (lets later runs skip known URLs)
+    - hashes: sha256 -> path                      (identical images are stored once)
+    """
+
+    def __init__(self, folder):
+        self.path = os.path.join(folder, MANIFEST_NAME)
+        self.urls = {}
+        self.hashes = {}
+        self.lock = threading.Lock()
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self.urls = data.get("urls", {})
+                self.hashes = data.get("hashes", {})
+            except (OSError, ValueError):
+                pass
+        # Forget files that were deleted since the last run
+        self.urls = {u: e for u, e in self.urls.items() if os.path.exists(e["path"])}
+        self.hashes = {h: p for h, p in self.hashes.items() if os.path.exists(p)}
+
+    def save(self):
+        with self.lock:
+            data = {"urls": self.urls, "hashes": self.hashes}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+def resolve_image_url(src, page_url=None):
+    """Absolute URL for an <img src>, resolved like a browser would (None if not fetchable)"""
+    src = str(src).strip()
+    if not src or src == 'nan':
+        return None
+    url = urljoin(page_url, src) if page_url else src
+    if url.startswith("//"):
+        url = "https:" + url
+    return url if url.startswith(('http://', 'https://')) else None
+
+
+def _filename_for(url, index, content_type=None):
+    name = unquote(os.path.basename(urlparse(url).path))
+    name = re.sub(r"[^\w.\-]+", "_", name).strip("._")
+    if not name or '.' not in name:
+        ext = mimetypes.guess_extension((content_type or "").split(";")[0].strip()) or ".jpg"
+        name = f"image_{index}{ext}"
+    return name
+
+
+def _claim_path(folder, filename):
+    """
+    Reserve a unique file name - created with O_EXCL, so concurrent downloads (other threads,
+    or another process writing into the same folder) can never claim the same name
+    """
+    name, ext = os.path.splitext(filename)
+    path = os.path.join(folder, filename)
+    counter = 1
+    while True:
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return path
+        except FileExistsError:
+            path = os.path.join(folder, f"{name}_{counter}{ext}")
+            counter += 1
+
+
+def _download_one(index, url, folder, manifest, user_agents):
+    result = {"url": url, "path": None, "status": "failed", "bytes": 0, "seconds": 0.0, "error": None}
+    start = time.perf_counter()
+
+    with manifest.lock:
+        known = manifest.urls.get(url)
+    if known:
+        result.update(path=known["path"], status="skipped", bytes=known["bytes"])
+        return result
+
+    tmp_path = os.path.join(folder, f".part-{threading.get_ident()}-{index}")
+    try:
+        headers = {"User-Agent": random.choice(user_agents)}
+        response = polite_call(url, get_session().get, url, headers=headers, timeout=10, verify=False, stream=True)
+        with response:
+            response.raise_for_status()
+            digest = hashlib.sha256()
+            size = 0
+            # Stream to disk while hashing - the body is never held in memory
+            with open(tmp_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+            content_type = response.headers.get("Content-Type")
+
+        sha256 = digest.hexdigest()
+        with manifest.lock:
+            existing = manifest.hashes.get(sha256)
+            if existing:
+                os.remove(tmp_path)
+                path, status = existing, "duplicate"
+            else:
+                path = _claim_path(folder, _filename_for(url, index, content_type))
+                os.replace(tmp_path, path)
+                manifest.hashes[sha256] = path
+                status = "downloaded"
+            manifest.urls[url] = {"path": path, "sha256": sha256, "bytes": size}
+
+        result.update(path=path, status=status, bytes=size)
+    except Exception as e:
+        result["error"] = str(e)
+        print(f"Failed to download {url}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    finally:
+        result["seconds"] = round(time.perf_counter() - start, 4)
+    return result
+
+
+def download_images_report(urls, page_url=None, output_folder="downloaded_images", max_workers=8, on_complete=None):
+    """
+    Concurrent image downloader
+    - relative src values are resolved with urljoin against page_url
+    - bodies are streamed to disk in chunks
+    - identical images (same sha256) are stored once, URLs downloaded by an earlier run are skipped
+    Returns one dict per URL: url, path, status (downloaded/duplicate/skipped/failed), bytes, seconds, error
+    on_complete(item) is called from the worker threads as soon as each URL finishes
+    """
+    from scraper_main import USER_AGENTS
+
+    os.makedirs(output_folder, exist_ok=True)
+    manifest = ImageManifest(output_folder)
+
+    targets = []
+    for src in urls:
+        url = resolve_image_url(src, page_url)
+        if url is None:
+            if str(src).strip() and str(src).strip() != 'nan':
+                print(f"Skipping invalid URL: {src}")
+            continue
+        targets.append(url)
+    targets = list(dict.fromkeys(targets))
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            def run(index, url):
+                item = _download_one(index, url, output_folder, manifest, USER_AGENTS)
+                if on_complete is not None:
+                    on_complete(item)
+                return item
+
+            futures = [pool.submit(run, index, url) for index, url in enumerate(targets, 1)]
+            report = [future.result() for future in futures]
+    finally:
+        manifest.save()
+    return report
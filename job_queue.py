@@ -0,0 +1,718 @@
+"""
+Durable work queue for distributed scraping
+
+    queue = open_queue("crawl.sqlite")            # or "redis://host:6379/0"
+    queue.put("catalog", urls)
+    run_worker(queue, "catalog", output_dir="out") # on as many machines / processes as you like
+
+- lease / ack: a leased task is invisible to other workers until it is acked, nacked,
+  or its lease expires (the worker crashed) - then it is handed out again
+- failed tasks are retried with exponential backoff, after `max_attempts` they go to the dead letters
+- per-host politeness holds across workers: a host is leased at most once every `host_interval` seconds,
+  and `shards` lets each worker own a stable slice of the hosts
+- workers checkpoint every finished page to their own JSONL part file before acking,
+  so a crash loses at most the pages that were in flight (every run starts a new part file,
+  so a restarted worker never overwrites pages it already acked)
+- leases are extended in the background while a page is worked on; a page whose lease was lost
+  anyway is neither written nor counted
+"""
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from collections import namedtuple
+from urllib.parse import urldefrag, urlparse
+
+from async_fetch import REQUESTS_PER_SECOND
+
+Task = namedtuple("Task", ["id", "job", "url", "depth", "attempts", "token"])
+
+LEASE_SECONDS = 120
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF = 5.0                       # seconds, doubled on every failed attempt
+HOST_INTERVAL = 1.0 / REQUESTS_PER_SECOND  # seconds between two leases of the same host
+
+
+def host_key(url):
+    """Stable hash of the URL's host (the same on every machine)"""
+    return zlib.crc32(urlparse(url).netloc.lower().encode("utf-8"))
+
+
+def _backoff(attempts):
+    return RETRY_BACKOFF * (2 ** max(attempts - 1, 0)) + random.uniform(0, 1)
+
+
+class JobQueue:
+    """
+    Interface shared by the queue backends
+    Every method takes the job name, so one queue can hold many jobs.
+    """
+
+    def __init__(self, shards=1, host_interval=None, max_attempts=MAX_ATTEMPTS):
+        self.shards = max(1, shards)
+        self.host_interval = HOST_INTERVAL if host_interval is None else host_interval
+        self.max_attempts = max_attempts
+
+    def put(self, job, urls, depth=0):
+        """Enqueue URLs (already known URLs of the job are ignored) - returns how many were new"""
+        raise NotImplementedError
+
+    def lease(self, job, worker, lease_seconds=LEASE_SECONDS, shard=None):
+        """Next available Task for `worker`, or None - shard limits it to hosts with host_key % shards == shard"""
+        raise NotImplementedError
+
+    def extend(self, task, lease_seconds=LEASE_SECONDS):
+        """Keep a long-running task leased - False if the lease was already lost"""
+        raise NotImplementedError
+
+    def ack(self, task, result=None):
+        """Mark the task done (result is a small JSON-able dict) - False if the lease was lost"""
+        raise NotImplementedError
+
+    def nack(self, task, error, retry=True):
+        """Report a failure - retried with backoff, or dead-lettered after max_attempts / retry=False"""
+        raise NotImplementedError
+
+    def stats(self, job):
+        """{"pending", "leased", "done", "dead"} counts"""
+        raise NotImplementedError
+
+    def dead_letters(self, job):
+        """[{"url", "attempts", "error"}] of tasks that gave up"""
+        raise NotImplementedError
+
+    def requeue_dead(self, job):
+        """Move dead-lettered tasks back to pending with a fresh attempt budget - returns the count"""
+        raise NotImplementedError
+
+    def results(self, job):
+        """[{"url", ...result}] of done tasks"""
+        raise NotImplementedError
+
+    def set_checkpoint(self, job, key, value):
+        raise NotImplementedError
+
+    def get_checkpoint(self, job, key, default=None):
+        raise NotImplementedError
+
+    def jobs(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SqliteQueue(JobQueue):
+    """
+    SQLite backed queue - one file shared by worker processes on a host or over a shared filesystem
+    (the filesystem must support POSIX locks; many network filesystems don't)
+    """
+
+    def __init__(self, path=".job_queue.sqlite", **options):
+        super().__init__(**options)
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY,
+                job TEXT NOT NULL,
+                url TEXT NOT NULL,
+                depth INTEGER NOT NULL DEFAULT 0,
+                host TEXT NOT NULL,
+                hkey INTEGER NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_token TEXT,
+                lease_expires REAL,
+                error TEXT,
+                result TEXT,
+                UNIQUE (job, url)
+            );
+            CREATE INDEX IF NOT EXISTS tasks_ready ON tasks (job, state, available_at);
+            CREATE TABLE IF NOT EXISTS hosts (host TEXT PRIMARY KEY, next_at REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS checkpoints (job TEXT, key TEXT, value TEXT, PRIMARY KEY (job, key));
+        """)
+
+    def _transaction(self, func):
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers never lease the same row
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(self._db)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return result
+
+    def put(self, job, urls, depth=0):
+        rows = []
+        for url in urls:
+            url = urldefrag(str(url).strip())[0]
+            if url.startswith(("http://", "https://")):
+                rows.append((job, url, depth, urlparse(url).netloc.lower(), host_key(url)))
+
+        def insert(db):
+            before = db.total_changes
+            db.executemany("INSERT OR IGNORE INTO tasks (job, url, depth, host, hkey) VALUES (?, ?, ?, ?, ?)", rows)
+            return db.total_changes - before
+        return self._transaction(insert)
+
+    def lease(self, job, worker, lease_seconds=LEASE_SECONDS, shard=None):
+        def take(db):
+            now = time.time()
+            # Leases of crashed workers that used up their attempts go to the dead letters
+            db.execute(
+                "UPDATE tasks SET state = 'dead', error = COALESCE(error, 'lease expired') "
+                "WHERE job = ? AND state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (job, now, self.max_attempts),
+            )
+            query = (
+                "SELECT t.id, t.url, t.depth, t.attempts, t.host FROM tasks t LEFT JOIN hosts h ON h.host = t.host "
+                "WHERE t.job = ? AND (t.state = 'pending' OR (t.state = 'leased' AND t.lease_expires < ?)) "
+                "AND t.available_at <= ? AND (h.next_at IS NULL OR h.next_at <= ?)"
+            )
+            params = [job, now, now, now]
+            if shard is not None:
+                query += " AND t.hkey % ? = ?"
+                params += [self.shards, shard]
+            row = db.execute(query + " ORDER BY t.available_at, t.id LIMIT 1", params).fetchone()
+            if row is None:
+                return None
+
+            task_id, url, depth, attempts, host = row
+            token = uuid.uuid4().hex
+            db.execute(
+                "UPDATE tasks SET state = 'leased', attempts = attempts + 1, lease_owner = ?, lease_token = ?, lease_expires = ? WHERE id = ?",
+                (worker, token, now + lease_seconds, task_id),
+            )
+            db.execute("INSERT OR REPLACE INTO hosts (host, next_at) VALUES (?, ?)", (host, now + self.host_interval))
+            return Task(task_id, job, url, depth, attempts + 1, token)
+        return self._transaction(take)
+
+    def extend(self, task, lease_seconds=LEASE_SECONDS):
+        def update(db):
+            cursor = db.execute(
+                "UPDATE tasks SET lease_expires = ? WHERE id = ? AND state = 'leased' AND lease_token = ?",
+                (time.time() + lease_seconds, task.id, task.token),
+            )
+            return cursor.rowcount == 1
+        return self._transaction(update)
+
+    def ack(self, task, result=None):
+        def update(db):
+            cursor = db.execute(
+                "UPDATE tasks SET state = 'done', result = ?, error = NULL, lease_expires = NULL "
+                "WHERE id = ? AND state = 'leased' AND lease_token = ?",
+                (json.dumps(result or {}), task.id, task.token),
+            )
+            return cursor.rowcount == 1
+        return self._transaction(update)
+
+    def nack(self, task, error, retry=True):
+        dead = not retry or task.attempts >= self.max_attempts
+
+        def update(db):
+            cursor = db.execute(
+                "UPDATE tasks SET state = ?, error = ?, available_at = ?, lease_expires = NULL "
+                "WHERE id = ? AND state = 'leased' AND lease_token = ?",
+                ("dead" if dead else "pending", str(error), time.time() + (0 if dead else _backoff(task.attempts)), task.id, task.token),
+            )
+            return cursor.rowcount == 1
+        return self._transaction(update)
+
+    def stats(self, job):
+        now = time.time()
+        counts = {"pending": 0, "leased": 0, "done": 0, "dead": 0}
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT CASE WHEN state = 'leased' AND lease_expires < ? THEN 'pending' ELSE state END, COUNT(*) "
+                "FROM tasks WHERE job = ? GROUP BY 1",
+                (now, job),
+            ).fetchall()
+        counts.update(dict(rows))
+        return counts
+
+    def dead_letters(self, job):
+        with self._lock:
+            rows = self._db.execute("SELECT url, attempts, error FROM tasks WHERE job = ? AND state = 'dead' ORDER BY id", (job,)).fetchall()
+        return [{"url": url, "attempts": attempts, "error": error} for url, attempts, error in rows]
+
+    def requeue_dead(self, job):
+        def update(db):
+            return db.execute(
+                "UPDATE tasks SET state = 'pending', attempts = 0, available_at = 0 WHERE job = ? AND state = 'dead'", (job,)
+            ).rowcount
+        return self._transaction(update)
+
+    def results(self, job):
+        with self._lock:
+            rows = self._db.execute("SELECT url, result FROM tasks WHERE job = ? AND state = 'done' ORDER BY id", (job,)).fetchall()
+        return [{"url": url, **json.loads(result or "{}")} for url, result in rows]
+
+    def set_checkpoint(self, job, key, value):
+        self._transaction(lambda db: db.execute(
+            "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?)", (job, key, json.dumps(value))
+        ))
+
+    def get_checkpoint(self, job, key, default=None):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM checkpoints WHERE job = ? AND key = ?", (job, key)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def jobs(self):
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT DISTINCT job FROM tasks ORDER BY job")]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class RedisQueue(JobQueue):
+    """
+    Redis backed queue for workers on several machines
+    Pass any redis-py compatible `client` (e.g. fakeredis.FakeStrictRedis() in tests), or a `url`.
+    Every lease state change also writes the task hash, so lease / extend / ack / nack WATCH it
+    and apply their check and update in one MULTI (retried when another worker got in between).
+    Keys (all under `prefix`):
+      {job}:pending:{shard}  sorted set  task id -> available at
+      {job}:leased           sorted set  task id -> lease expires at
+      {job}:seen             set         URLs ever enqueued
+      {job}:dead / :done     sets        finished task ids
+      task:{id}              hash        url, depth, attempts, token, error, result
+      host:{host}            string      held for host_interval after every lease (SET NX PX)
+    """
+
+    def __init__(self, client=None, url="redis://localhost:6379/0", prefix="webharvester", **options):
+        super().__init__(**options)
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise ImportError("redis is required for the Redis queue (pip install redis)")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, *parts):
+        return ":".join((self.prefix,) + tuple(str(p) for p in parts))
+
+    @staticmethod
+    def _text(value):
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def _task_fields(self, task_id):
+        return {self._text(k): self._text(v) for k, v in self.client.hgetall(self._key("task", task_id)).items()}
+
+    def _watch_task(self, task_id, func):
+        """func(pipe) with the task hash WATCHed - reads run immediately, writes after pipe.multi() are atomic"""
+        return self.client.transaction(func, self._key("task", task_id), value_from_callable=True)
+
+    def _owns(self, pipe, task):
+        return self._text(pipe.hget(self._key("task", task.id), "token")) == task.token and \
+            pipe.zscore(self._key(task.job, "leased"), task.id) is not None
+
+    def put(self, job, urls, depth=0):
+        added = 0
+        self.client.sadd(self._key("jobs"), job)
+        for url in urls:
+            url = urldefrag(str(url).strip())[0]
+            if not url.startswith(("http://", "https://")):
+                continue
+            if not self.client.sadd(self._key(job, "seen"), url):
+                continue
+            task_id = self.client.incr(self._key("next_id"))
+            self.client.hset(self._key("task", task_id), mapping={"job": job, "url": url, "depth": depth, "attempts": 0})
+            self.client.zadd(self._key(job, "pending", host_key(url) % self.shards), {task_id: 0})
+            added += 1
+        return added
+
+    def _reclaim(self, job):
+        """Move expired leases back to pending (whoever removes it from the leased set owns the move)"""
+        now = time.time()
+        for task_id in self.client.zrangebyscore(self._key(job, "leased"), 0, now):
+            task_id = self._text(task_id)
+            # Clearing the token touches the task hash, which aborts a concurrent ack / extend of the old lease
+            pipe = self.client.pipeline()
+            pipe.zrem(self._key(job, "leased"), task_id)
+            pipe.hdel(self._key("task", task_id), "token")
+            if not pipe.execute()[0]:
+                continue
+            fields = self._task_fields(task_id)
+            if int(fields.get("attempts", 0)) >= self.max_attempts:
+                self.client.hset(self._key("task", task_id), "error", fields.get("error") or "lease expired")
+                self.client.sadd(self._key(job, "dead"), task_id)
+            else:
+                self.client.zadd(self._key(job, "pending", host_key(fields["url"]) % self.shards), {task_id: now})
+
+    def lease(self, job, worker, lease_seconds=LEASE_SECONDS, shard=None):
+        self._reclaim(job)
+        now = time.time()
+        shards = [shard] if shard is not None else range(self.shards)
+        for index in shards:
+            pending = self._key(job, "pending", index)
+            for task_id in self.client.zrangebyscore(pending, 0, now, start=0, num=32):
+                task_id = self._text(task_id)
+                url = self._text(self.client.hget(self._key("task", task_id), "url"))
+                host = urlparse(url).netloc.lower()
+                # Host politeness: only one lease per host_interval across every worker
+                if self.host_interval > 0 and not self.client.set(
+                    self._key("host", host), worker, nx=True, px=max(1, int(self.host_interval * 1000))
+                ):
+                    continue
+                token = uuid.uuid4().hex
+
+                def claim(pipe):
+                    task_key = self._key("task", task_id)
+                    if pipe.zscore(pending, task_id) is None:
+                        return None  # another worker took it
+                    attempts = int(self._text(pipe.hget(task_key, "attempts")) or 0) + 1
+                    depth = int(self._text(pipe.hget(task_key, "depth")) or 0)
+                    pipe.multi()
+                    pipe.zrem(pending, task_id)
+                    pipe.hset(task_key, mapping={"attempts": attempts, "token": token, "owner": worker})
+                    pipe.zadd(self._key(job, "leased"), {task_id: now + lease_seconds})
+                    return attempts, depth
+
+                claimed = self._watch_task(task_id, claim)
+                if claimed is None:
+                    continue
+                attempts, depth = claimed
+                return Task(task_id, job, url, depth, attempts, token)
+        return None
+
+    def extend(self, task, lease_seconds=LEASE_SECONDS):
+        def update(pipe):
+            if not self._owns(pipe, task):
+                return False
+            pipe.multi()
+            pipe.zadd(self._key(task.job, "leased"), {task.id: time.time() + lease_seconds})
+            return True
+        return self._watch_task(task.id, update)
+
+    def ack(self, task, result=None):
+        def update(pipe):
+            if not self._owns(pipe, task):
+                return False
+            pipe.multi()
+            pipe.zrem(self._key(task.job, "leased"), task.id)
+            pipe.hset(self._key("task", task.id), mapping={"result": json.dumps(result or {}), "token": ""})
+            pipe.sadd(self._key(task.job, "done"), task.id)
+            return True
+        return self._watch_task(task.id, update)
+
+    def nack(self, task, error, retry=True):
+        dead = not retry or task.attempts >= self.max_attempts
+
+        def update(pipe):
+            if not self._owns(pipe, task):
+                return False
+            pipe.multi()
+            pipe.zrem(self._key(task.job, "leased"), task.id)
+            pipe.hset(self._key("task", task.id), mapping={"error": str(error), "token": ""})
+            if dead:
+                pipe.sadd(self._key(task.job, "dead"), task.id)
+            else:
+                pending = self._key(task.job, "pending", host_key(task.url) % self.shards)
+                pipe.zadd(pending, {task.id: time.time() + _backoff(task.attempts)})
+            return True
+        return self._watch_task(task.id, update)
+
+    def stats(self, job):
+        self._reclaim(job)
+        return {
+            "pending": sum(self.client.zcard(self._key(job, "pending", i)) for i in range(self.shards)),
+            "leased": self.client.zcard(self._key(job, "leased")),
+            "done": self.client.scard(self._key(job, "done")),
+            "dead": self.client.scard(self._key(job, "dead")),
+        }
+
+    def _tasks_in(self, job, name):
+        ids = sorted(int(self._text(i)) for i in self.client.smembers(self._key(job, name)))
+        return [(task_id, self._task_fields(task_id)) for task_id in ids]
+
+    def dead_letters(self, job):
+        return [
+            {"url": fields.get("url"), "attempts": int(fields.get("attempts", 0)), "error": fields.get("error")}
+            for _, fields in self._tasks_in(job, "dead")
+        ]
+
+    def requeue_dead(self, job):
+        count = 0
+        for task_id, fields in self._tasks_in(job, "dead"):
+            if self.client.srem(self._key(job, "dead"), task_id):
+                self.client.hset(self._key("task", task_id), "attempts", 0)
+                self.client.zadd(self._key(job, "pending", host_key(fields["url"]) % self.shards), {task_id: 0})
+                count += 1
+        return count
+
+    def results(self, job):
+        return [{"url": fields.get("url"), **json.loads(fields.get("result") or "{}")} for _, fields in self._tasks_in(job, "done")]
+
+    def set_checkpoint(self, job, key, value):
+        self.client.hset(self._key(job, "checkpoints"), key, json.dumps(value))
+
+    def get_checkpoint(self, job, key, default=None):
+        value = self.client.hget(self._key(job, "checkpoints"), key)
+        return json.loads(self._text(value)) if value is not None else default
+
+    def jobs(self):
+        return sorted(self._text(job) for job in self.client.smembers(self._key("jobs")))
+
+
+def open_queue(spec=None, **options):
+    """Queue from a spec string: "redis://..." for Redis, anything else is a SQLite file path"""
+    spec = spec or ".job_queue.sqlite"
+    if spec.startswith(("redis://", "rediss://", "unix://")):
+        return RedisQueue(url=spec, **options)
+    return SqliteQueue(spec, **options)
+
+
+# --- submitting and working ---
+
+_robots = {}
+_robots_lock = threading.Lock()
+
+
+def _robots_allow(url):
+    """robots.txt check for `url` (robots.txt is fetched once per origin and process)"""
+    from frontier import load_robots
+
+    parsed = urlparse(url)
+    origin = f"{parsed.scheme}://{parsed.netloc}"
+    with _robots_lock:
+        robots = _robots.get(origin)
+    if robots is None:
+        robots = load_robots(origin)
+        with _robots_lock:
+            _robots[origin] = robots
+    return robots is False or robots.can_fetch("*", url)
+
+
+def _link_filter(crawl):
+    """
+    Function mapping a link to its canonical URL, or None when the crawl rules reject it
+    (other host with same_domain, link_pattern mismatch, disallowed by robots.txt with respect_robots)
+    """
+    import re
+
+    from frontier import canonicalize_url
+
+    seed = crawl["seed"] if "://" in crawl["seed"] else "https://" + crawl["seed"]
+    seed = canonicalize_url(seed) or seed
+    seed_host = urlparse(seed).netloc
+    pattern = re.compile(crawl["link_pattern"]) if crawl.get("link_pattern") else None
+
+    def allow(link):
+        link = canonicalize_url(link)
+        if link is None:
+            return None
+        if crawl.get("same_domain", True) and urlparse(link).netloc != seed_host:
+            return None
+        if pattern and not pattern.search(link) and link != seed:
+            return None
+        if crawl.get("respect_robots") and not _robots_allow(link):
+            return None
+        return link
+    return allow
+
+
+def submit_task(queue, job, task):
+    """
+    Enqueue one jobs.py style task under the queue job name `job`
+    The task options are checkpointed with the queue so any worker can pick the job up.
+    Crawls queue the seed, plus its sitemap URLs (as depth 1) with use_sitemaps.
+    """
+    from frontier import site_sitemap_urls
+    from jobs import _validate
+
+    _validate(task)
+    crawl = task.get("crawl")
+    if crawl and crawl.get("frontier_path"):
+        raise ValueError("frontier_path does not apply to queued crawls - the queue is their frontier")
+    queue.set_checkpoint(job, "task", task)
+    if crawl:
+        allow = _link_filter(crawl)
+        seed = crawl["seed"] if "://" in crawl["seed"] else "https://" + crawl["seed"]
+        seed = allow(seed)
+        added = queue.put(job, [seed]) if seed else 0
+        if crawl.get("use_sitemaps") and crawl.get("max_depth", 2) >= 1:
+            limit = crawl.get("max_pages", 50)
+            urls = []
+            for url in site_sitemap_urls(seed or crawl["seed"]):
+                url = allow(url)
+                if url:
+                    urls.append(url)
+                    if len(urls) >= limit:
+                        break
+            added += queue.put(job, urls, depth=1)
+        return added
+    return queue.put(job, [u if str(u).startswith(("http://", "https://")) else f"https://{u}" for u in task["urls"]])
+
+
+def _follow(queue, job, task, crawl, links, depth):
+    """
+    Enqueue crawl links that pass the task's rules, robots.txt included (the queue drops URLs it has seen)
+    Links are canonicalized first, so spellings of the same page are only queued once.
+    """
+    allow = _link_filter(crawl)
+    stats = queue.stats(job)
+    budget = crawl.get("max_pages", 50) - sum(stats.values())
+    keep = [link for link in map(allow, links) if link]
+    keep = list(dict.fromkeys(keep))[:max(budget, 0)]
+    if keep:
+        queue.put(job, keep, depth=depth + 1)
+
+
+class _Heartbeat:
+    """Extends a task's lease every lease_seconds / 3 while it is worked on - `lost` once the queue refuses"""
+
+    def __init__(self, queue, task, lease_seconds):
+        self.queue = queue
+        self.task = task
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                if not self.queue.extend(self.task, self.lease_seconds):
+                    self.lost = True
+                    return
+            except Exception as e:
+                print(f"Could not extend the lease of {self.task.url}: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_worker(queue, job, output_dir="jobs_output", worker=None, lease_seconds=LEASE_SECONDS, shard=None,
+               idle_timeout=30.0, poll_interval=1.0, max_tasks=None, api_key=None):
+    """
+    Work on `job` until it is finished (nothing pending or leased), idle for `idle_timeout`
+    seconds, or `max_tasks` tasks were processed. Every finished page is appended to this
+    run's JSONL part file and flushed before the task is acked; pages whose lease was lost
+    (another worker has them now) are dropped from the part and counted as "lost".
+    Returns {"worker", "part", "tasks", "failed", "lost", "rows"}
+    """
+    from exporters import JsonLinesWriter
+    from scraper_main import _scrape_page
+
+    task_options = queue.get_checkpoint(job, "task")
+    if task_options is None:
+        raise ValueError(f"Unknown job {job!r} - submit it first")
+    crawl = task_options.get("crawl")
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    # A new part per run - a restarted worker with the same id must not truncate pages it acked before
+    part = os.path.join(output_dir, f"{job}.part-{worker}-{uuid.uuid4().hex[:8]}.jsonl")
+    summary = {"worker": worker, "part": part, "tasks": 0, "failed": 0, "lost": 0, "rows": 0}
+
+    idle_since = None
+    with JsonLinesWriter(part) as writer:
+        while max_tasks is None or summary["tasks"] + summary["failed"] + summary["lost"] < max_tasks:
+            task = queue.lease(job, worker, lease_seconds, shard)
+            if task is None:
+                stats = queue.stats(job)
+                if not stats["pending"] and not stats["leased"]:
+                    break
+                idle_since = idle_since or time.monotonic()
+                if time.monotonic() - idle_since > idle_timeout:
+                    break
+                time.sleep(poll_interval)
+                continue
+            idle_since = None
+
+            try:
+                follow = bool(crawl) and task.depth < crawl.get("max_depth", 2)
+                with _Heartbeat(queue, task, lease_seconds) as heartbeat:
+                    df, links = _scrape_page(
+                        task.url, task_options.get("tag_type", "alltext"), task_options.get("limit", 50),
+                        task_options.get("custom_tag"), task_options.get("parse_text"), task_options.get("use_proxies", False),
+                        api_key, parser=task_options.get("parser"), follow_links=follow,
+                        model_name=task_options.get("model_name"), schema=task_options.get("schema"),
+                    )
+                if heartbeat.lost or not queue.extend(task, lease_seconds):
+                    print(f"Lease on {task.url} was lost - result dropped")
+                    summary["lost"] += 1
+                    continue
+                rows = 0
+                position = writer.tell()
+                if df is not None and not df.empty:
+                    writer.write(df.assign(source_url=task.url)[["source_url", *df.columns]])
+                    writer.flush()
+                    rows = len(df)
+                if follow:
+                    _follow(queue, job, task, crawl, links, task.depth)
+                if not queue.ack(task, {"rows": rows, "part": part, "worker": worker}):
+                    writer.truncate(position)  # the page is another worker's now
+                    print(f"Lease on {task.url} was lost - result dropped")
+                    summary["lost"] += 1
+                    continue
+                summary["tasks"] += 1
+                summary["rows"] += rows
+            except Exception as e:
+                print(f"Task {task.url} failed (attempt {task.attempts}): {e}")
+                # 4xx answers (except 408 / 429) won't change on a retry
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                queue.nack(task, e, retry=not (status and 400 <= status < 500 and status not in (408, 429)))
+                summary["failed"] += 1
+    return summary
+
+
+def _read_part(path, batch_rows=10000):
+    """Rows of a JSONL part file in batches (a line cut off by a crash is skipped)"""
+    batch = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                batch.append(json.loads(line))
+            except ValueError:
+                continue
+            if len(batch) >= batch_rows:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def export_job(queue, job, output_dir, path, fmt=None):
+    """
+    Merge the part files of a job into one output file - returns {"path", "rows"}
+    Only rows from the part file of the worker that acked a page are kept, so pages that
+    were re-done after a crash appear once.
+    """
+    import glob
+
+    import pandas as pd
+
+    from exporters import open_writer
+
+    acked_part = {item["url"]: item.get("part") for item in queue.results(job)}
+    parts = sorted(glob.glob(os.path.join(output_dir, f"{job}.part-*.jsonl")))
+    with open_writer(path, fmt) as writer:
+        for part in parts:
+            for batch in _read_part(part):
+                df = pd.DataFrame(batch)
+                keep = df["source_url"].map(lambda url: os.path.basename(acked_part.get(url) or "") == os.path.basename(part))
+                writer.write(df[keep])
+    return {"path": path, "rows": writer.rows}
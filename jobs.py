@@ -0,0 +1,175 @@
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
+
+from exporters import open_writer
+from images import download_images_report
+from metrics import diff, snapshot
+from scraper_main import iter_crawl, iter_scrape
+
+# Options a task may set (anything else in the job file is rejected)
+TASK_OPTIONS = {
+    "name", "urls", "crawl", "tag_type", "limit", "custom_tag", "parse_text", "model_name",
+    "schema", "parser", "use_proxies", "download_images", "format", "process_workers",
+}
+CRAWL_OPTIONS = {"seed", "max_pages", "max_depth", "same_domain", "link_pattern", "use_sitemaps", "respect_robots", "frontier_path"}
+
+
+def load_job(path):
+    """
+    Read a JSON job file:
+    {
+      "name": "catalog",
+      "output_dir": "out/catalog",
+      "format": "jsonl",                      # parquet / arrow / jsonl / csv
+      "parallelism": 8,
+      "defaults": {"tag_type": "links", "limit": 100, "use_proxies": false},
+      "tasks": [
+        {"name": "products", "urls": ["https://...", "..."], "parse_text": "product names and prices"},
+        {"name": "blog", "crawl": {"seed": "https://...", "max_pages": 50, "max_depth": 2}}
+      ]
+    }
+    A top-level "urls" list is shorthand for a single task.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        job = json.load(f)
+    job.setdefault("name", os.path.splitext(os.path.basename(path))[0])
+    return job
+
+
+def _task_name(task, index):
+    name = task.get("name") or f"task_{index}"
+    return re.sub(r"[^\w.-]+", "_", name)
+
+
+def _validate(task):
+    unknown = set(task) - TASK_OPTIONS
+    if unknown:
+        raise ValueError(f"Unknown task options: {', '.join(sorted(unknown))}")
+    if bool(task.get("urls")) == bool(task.get("crawl")):
+        raise ValueError("A task needs exactly one of 'urls' or 'crawl'")
+    if task.get("crawl"):
+        unknown = set(task["crawl"]) - CRAWL_OPTIONS
+        if unknown:
+            raise ValueError(f"Unknown crawl options: {', '.join(sorted(unknown))}")
+        if not task["crawl"].get("seed"):
+            raise ValueError("crawl needs a 'seed' URL")
+    if task.get("crawl") and task.get("process_workers"):
+        raise ValueError("process_workers is only supported for 'urls' tasks")
+    if task.get("tag_type") == "rawhtml":
+        raise ValueError("rawhtml is not supported by the job runner")
+
+
+def run_task(task, output_dir, fmt="jsonl", parallelism=8, api_key=None, index=1):
+    """Run one task, streaming rows to <output_dir>/<name>.<format>; returns its summary dict"""
+    _validate(task)
+    name = _task_name(task, index)
+    fmt = task.get("format", fmt)
+    output_path = os.path.join(output_dir, f"{name}.{fmt}")
+
+    options = dict(
+        tag_type=task.get("tag_type", "alltext"),
+        limit=task.get("limit", 50),
+        custom_tag=task.get("custom_tag"),
+        parse_text=task.get("parse_text"),
+        use_proxies=task.get("use_proxies", False),
+        api_key=api_key,
+        parser=task.get("parser"),
+        max_workers=parallelism,
+        model_name=task.get("model_name"),
+        schema=task.get("schema"),
+    )
+    if task.get("crawl"):
+        crawl = dict(task["crawl"])
+        results = iter_crawl(crawl.pop("seed"), **options, **crawl)
+        planned = task["crawl"].get("max_pages", 50)
+    else:
+        results = iter_scrape(task["urls"], **options, process_workers=task.get("process_workers"))
+        planned = len(task["urls"])
+
+    summary = {"name": name, "output": output_path, "format": fmt, "pages": 0, "empty_pages": 0, "rows": 0}
+    image_sources = []
+    start = time.perf_counter()
+
+    with open_writer(output_path, fmt) as writer:
+        for url, df in results:
+            summary["pages"] += 1
+            if df is None or df.empty:
+                summary["empty_pages"] += 1
+                continue
+            writer.write(df.assign(source_url=url)[["source_url", *df.columns]])
+            if task.get("download_images") and "src" in df.columns:
+                image_sources.extend((url, src) for src in df["src"].tolist())
+        summary["rows"] = writer.rows
+
+    if task.get("crawl") is None:
+        summary["failed_pages"] = max(planned - summary["pages"], 0)
+    fetch_seconds = time.perf_counter() - start
+    summary["fetch_seconds"] = round(fetch_seconds, 3)
+    summary["pages_per_second"] = round(summary["pages"] / fetch_seconds, 2) if fetch_seconds else 0.0
+
+    if image_sources:
+        image_start = time.perf_counter()
+        report = []
+        # Relative src values are resolved against the page they came from
+        by_page = {}
+        for page_url, src in image_sources:
+            by_page.setdefault(page_url, []).append(src)
+        for page_url, sources in by_page.items():
+            report.extend(download_images_report(
+                sources, page_url=page_url, output_folder=os.path.join(output_dir, f"{name}_images"),
+                max_workers=parallelism,
+            ))
+        summary["images"] = {
+            status: sum(1 for item in report if item["status"] == status)
+            for status in ("downloaded", "duplicate", "skipped", "failed")
+        }
+        summary["images"]["bytes"] = sum(item["bytes"] for item in report if item["status"] == "downloaded")
+        summary["images"]["seconds"] = round(time.perf_counter() - image_start, 3)
+
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    return summary
+
+
+def run_job(job, output_dir=None, parallelism=None, fmt=None, api_key=None):
+    """
+    Run a job (dict from load_job) headlessly and write a machine-readable summary.json
+    next to the outputs. Returns the summary dict.
+    """
+    defaults = job.get("defaults", {})
+    tasks = job.get("tasks") or [{"urls": job.get("urls", [])}]
+    output_dir = output_dir or job.get("output_dir") or os.path.join("jobs_output", job.get("name", "job"))
+    parallelism = parallelism or job.get("parallelism", 8)
+    fmt = fmt or job.get("format", "jsonl")
+    api_key = api_key or job.get("api_key") or os.environ.get("GROQ_API_KEY")
+    os.makedirs(output_dir, exist_ok=True)
+
+    summary = {
+        "job": job.get("name"),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "output_dir": output_dir,
+        "parallelism": parallelism,
+        "tasks": [],
+    }
+    metrics_before = snapshot()
+    start = time.perf_counter()
+    for index, task in enumerate(tasks, 1):
+        task = {**defaults, **task}
+        try:
+            result = run_task(task, output_dir, fmt=fmt, parallelism=parallelism, api_key=api_key, index=index)
+            result["status"] = "ok"
+        except Exception as e:
+            result = {"name": _task_name(task, index), "status": "error", "error": str(e)}
+            print(f"Task {result['name']} failed: {e}")
+        summary["tasks"].append(result)
+
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    summary["rows"] = sum(t.get("rows", 0) for t in summary["tasks"])
+    summary["ok"] = all(t["status"] == "ok" for t in summary["tasks"])
+    summary["metrics"] = diff(metrics_before)
+
+    with open(os.path.join(output_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    return summary
@@ -0,0 +1,250 @@
+"""
+Pipeline instrumentation - per-stage spans, counters and exporters
+
+    from metrics import span, inc
+    with span("fetch"):
+        ...
+    inc("bytes_downloaded", len(body))
+
+Stages: proxy, polite_wait, ttfb, download, parse, extract, chunk, llm_rate_limit, llm, dataframe
+Counters: bytes_downloaded, cache_requests{cache, result}, proxy_requests{result}, llm_calls, llm_tokens{kind}, pages_fetched, rows
+Export with prometheus_text() / metrics_json(), or serve_metrics(port) for a scrape endpoint.
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "web_harvester"
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+STAGES = ("proxy", "polite_wait", "ttfb", "download", "parse", "extract", "chunk", "llm_rate_limit", "llm", "dataframe")
+
+ENABLED = True  # set to False to turn every span / counter into a no-op
+
+
+class _Histogram:
+    __slots__ = ("buckets", "count", "sum", "max")
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+
+
+def _labels_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escape = lambda v: v.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in pairs) + "}"
+
+
+def _with_hit_rates(caches):
+    for entry in caches.values():
+        entry["hit_rate"] = round(entry["hits"] / entry["requests"], 4) if entry["requests"] else 0.0
+    return caches
+
+
+class Metrics:
+    """Thread-safe registry of counters and stage-duration histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._stages = {}
+        self.started = time.time()
+
+    def inc(self, name, value=1, **labels):
+        if not ENABLED:
+            return
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, stage, seconds, **labels):
+        if not ENABLED:
+            return
+        key = (stage, _labels_key(labels))
+        with self._lock:
+            histogram = self._stages.get(key)
+            if histogram is None:
+                histogram = self._stages[key] = _Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def span(self, stage, **labels):
+        """Time the enclosed block as one `stage` span (recorded even if it raises)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        """
+        Plain-dict copy of everything recorded so far:
+        {"stages": {stage: {"count", "seconds", "max"}}, "counters": {"name{label=...}": value},
+         "caches": {cache: {"hits", "requests", "hit_rate"}}}
+        """
+        with self._lock:
+            stages = {}
+            for (stage, key), h in self._stages.items():
+                entry = stages.setdefault(stage + _format_labels(key), {"count": 0, "seconds": 0.0, "max": 0.0})
+                entry["count"] += h.count
+                entry["seconds"] += h.sum
+                entry["max"] = max(entry["max"], h.max)
+            counters = {name + _format_labels(key): value for (name, key), value in self._counters.items()}
+            caches = {}
+            for (name, key), value in self._counters.items():
+                if name == "cache_requests":
+                    labels = dict(key)
+                    entry = caches.setdefault(labels.get("cache", ""), {"hits": 0, "requests": 0})
+                    entry["requests"] += value
+                    if labels.get("result") in ("hit", "revalidated"):
+                        entry["hits"] += value
+        for entry in stages.values():
+            entry["seconds"] = round(entry["seconds"], 6)
+            entry["max"] = round(entry["max"], 6)
+        return {"stages": stages, "counters": counters, "caches": _with_hit_rates(caches)}
+
+    def prometheus_text(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            stages = sorted((key, (list(h.buckets), h.count, h.sum)) for key, h in self._stages.items())
+
+        seen = set()
+        for (name, key), value in counters:
+            metric = f"{PREFIX}_{name}_total"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_format_labels(key)} {value}")
+
+        metric = f"{PREFIX}_stage_seconds"
+        if stages:
+            lines.append(f"# HELP {metric} Time spent per pipeline stage")
+            lines.append(f"# TYPE {metric} histogram")
+        for (stage, key), (buckets, count, total) in stages:
+            key = (("stage", stage),) + key
+            for bound, value in zip(BUCKETS, buckets):
+                lines.append(f"{metric}_bucket{_format_labels(key, [('le', repr(bound))])} {value}")
+            lines.append(f"{metric}_bucket{_format_labels(key, [('le', '+Inf')])} {count}")
+            lines.append(f"{metric}_sum{_format_labels(key)} {total:.6f}")
+            lines.append(f"{metric}_count{_format_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._stages.clear()
+            self.started = time.time()
+
+
+_metrics = Metrics()
+
+
+def get_metrics():
+    return _metrics
+
+
+def span(stage, **labels):
+    return _metrics.span(stage, **labels)
+
+
+def inc(name, value=1, **labels):
+    _metrics.inc(name, value, **labels)
+
+
+def observe(stage, seconds, **labels):
+    _metrics.observe(stage, seconds, **labels)
+
+
+def snapshot():
+    return _metrics.snapshot()
+
+
+def prometheus_text():
+    return _metrics.prometheus_text()
+
+
+def metrics_json(indent=None):
+    return json.dumps(snapshot(), indent=indent)
+
+
+def diff(before, after=None):
+    """What happened between two snapshots (e.g. around one scrape) - same shape as snapshot()"""
+    after = after or snapshot()
+    stages = {}
+    for stage, entry in after["stages"].items():
+        old = before["stages"].get(stage, {"count": 0, "seconds": 0.0})
+        count = entry["count"] - old["count"]
+        if count:
+            stages[stage] = {"count": count, "seconds": round(entry["seconds"] - old["seconds"], 6)}
+    counters = {
+        name: value - before["counters"].get(name, 0)
+        for name, value in after["counters"].items()
+        if value != before["counters"].get(name, 0)
+    }
+    caches = {}
+    for cache, entry in after["caches"].items():
+        old = before["caches"].get(cache, {"hits": 0, "requests": 0})
+        if entry["requests"] != old["requests"]:
+            caches[cache] = {"hits": entry["hits"] - old["hits"], "requests": entry["requests"] - old["requests"]}
+    return {"stages": stages, "counters": counters, "caches": _with_hit_rates(caches)}
+
+
+def stage_breakdown(report):
+    """Rows (stage, spans, seconds, share) from a snapshot/diff, slowest first - for tables and charts"""
+    total = sum(entry["seconds"] for entry in report["stages"].values()) or 1.0
+    rows = [
+        {"stage": stage, "spans": entry["count"], "seconds": round(entry["seconds"], 3),
+         "share": round(entry["seconds"] / total, 3)}
+        for stage, entry in report["stages"].items()
+    ]
+    return sorted(rows, key=lambda row: row["seconds"], reverse=True)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") in ("", "/metrics"):
+            body, content_type = prometheus_text(), "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path.rstrip("/") == "/metrics.json":
+            body, content_type = metrics_json(indent=2), "application/json"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port=9108, host="127.0.0.1"):
+    """
+    Serve /metrics (Prometheus text) and /metrics.json from a background thread
+    Returns the server - call server.shutdown() to stop it
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
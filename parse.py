@@ -1,5 +1,17 @@
-from langchain_groq import ChatGroq
+import json
+import logging
+import random
+import re
+import threading
+import time
+
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+from llm_cache import LLMCache
+from metrics import inc, span
+
+logger = logging.getLogger(__name__)
 
 # 🔧 Improved Prompt Template
 template = """Extract the following information: {parse_description}
@@ -13,52 +25,462 @@ Requirements:
 4. Do not include "not found" messages or conversational text.
 5. Do not include bullet points or numbering, just the data values."""
 
+# ⚙️ Concurrency + provider limits (Groq defaults, adjust for your plan)
+MAX_CONCURRENCY = 4          # chunks in flight at once
+REQUESTS_PER_MINUTE = 30     # provider RPM limit
+TOKENS_PER_MINUTE = 12000    # provider TPM limit
+MAX_RETRIES = 5              # retries for rate-limited (429) calls
+RETRY_BACKOFF = 2.0          # seconds, doubled on every retry
+
+DEFAULT_MODEL = "llama-3.3-70b-versatile"
+
+# Persistent result cache (set LLM_CACHE_PATH to "" to disable)
+LLM_CACHE_PATH = ".llm_cache.sqlite"
+LLM_CACHE_MAX_ENTRIES = 50000
+
+# Phrases the model uses when it found nothing
+EMPTY_ITEMS = ['none', 'no data found', 'n/a', 'no information found', '', 'empty string']
+
+
+class ExtractionError(RuntimeError):
+    """
+    Raised by parse_content / parse_structured(strict=True) when chunks failed after all retries
+    - failed: indices of the failed chunks, results: per-chunk results ([] for the failed ones)
+    """
+
+    def __init__(self, failed, results):
+        super().__init__(f"LLM extraction failed for {len(failed)} of {len(results)} chunks")
+        self.failed = failed
+        self.results = results
+
+
+class TokenBucket:
+    """Thread-safe token bucket - `capacity` tokens, refilled evenly over one minute"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        """Block until `amount` tokens are available, then take them"""
+        amount = min(float(amount), self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits for one provider account"""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests = TokenBucket(requests_per_minute or REQUESTS_PER_MINUTE)
+        self.tokens = TokenBucket(tokens_per_minute or TOKENS_PER_MINUTE)
+
+    def acquire(self, tokens):
+        self.requests.acquire(1)
+        self.tokens.acquire(tokens)
+
+
+_rate_limiter = None
+
+def get_rate_limiter():
+    """Shared limiter - provider limits apply to the whole account, not to one call"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter()
+    return _rate_limiter
+
+_llm_cache = None
+
+def get_llm_cache():
+    """Shared LLM result cache, created on first use"""
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = LLMCache(LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES)
+    return _llm_cache
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+def _is_rate_limited(error):
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    message = str(error).lower()
+    return status == 429 or "429" in message or "rate limit" in message
+
+def _response_text(response):
+    # Extract text from response
+    if hasattr(response, 'content'):
+        return response.content.strip()
+    elif isinstance(response, str):
+        return response.strip()
+    return str(response).strip()
+
+def _clean_items(result_text):
+    # Split by newline to get individual items
+    items = [item.strip() for item in result_text.split('\n') if item.strip()]
+    
+    # Filter out common "not found" phrases
+    clean_items = []
+    for item in items:
+        clean_item = item.lower().strip('"').strip("'")
+        if clean_item not in EMPTY_ITEMS:
+            clean_items.append(item.strip('"').strip("'"))
+    return clean_items
+
+def _record_tokens(response, prompt_tokens, output_text=None):
+    """
+    Token counts from the provider's usage metadata, estimated when it isn't reported
+    (output_text is what to estimate the output from when the message text is empty, e.g. tool calls)
+    """
+    usage = getattr(response, "usage_metadata", None) or {}
+    if not usage.get("input_tokens"):
+        # Older integrations only report OpenAI-style counts in response_metadata
+        token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+        usage = {"input_tokens": token_usage.get("prompt_tokens"), "output_tokens": token_usage.get("completion_tokens")}
+    if usage.get("input_tokens"):
+        inc("llm_tokens", usage["input_tokens"], kind="input")
+        inc("llm_tokens", usage.get("output_tokens") or 0, kind="output")
+    else:
+        text = _response_text(response) if response is not None else ""
+        inc("llm_tokens", prompt_tokens, kind="input_estimated")
+        inc("llm_tokens", estimate_tokens(str(text or output_text or "")), kind="output_estimated")
+
 def get_llm(api_key=None, model_name=None):
+    from langchain_groq import ChatGroq
+
     return ChatGroq(
-        model=model_name or "llama-3.3-70b-versatile",
+        model=model_name or DEFAULT_MODEL,
         api_key=api_key
     )
 
-def parse_content(dom_chunks, parse_description, api_key=None, model_name=None):
+def _run_chunks(dom_chunks, call, cache=None, cache_key=None, max_concurrency=None, rate_limiter=None, prompt_text=""):
+    """
+    Shared driver: runs call(chunk) -> list for every chunk, concurrently and in order,
+    with cache lookups, RPM/TPM limiting and 429 retries
+    Returns (per-chunk results, indices of the chunks that failed) - a failed chunk's result is []
+    """
+    limiter = rate_limiter or get_rate_limiter()
+    total = len(dom_chunks)
+
+    def process(indexed_chunk):
+        i, chunk = indexed_chunk
+        if cache is not None:
+            key = cache_key(chunk)
+            cached = cache.get(key)
+            if cached is not None:
+                inc("cache_requests", cache="llm", result="hit")
+                print(f"💾 Batch {i}/{total} served from cache")
+                return cached
+            inc("cache_requests", cache="llm", result="miss")
+        
+        print(f"🧠 Processing batch {i}/{total}...")
+        tokens = estimate_tokens(prompt_text + chunk)
+
+        for attempt in range(MAX_RETRIES + 1):
+            with span("llm_rate_limit"):
+                limiter.acquire(tokens)
+            inc("llm_calls")
+            try:
+                with span("llm"):
+                    items = call(chunk)
+                if cache is not None:
+                    cache.set(key, items)
+                return items
+            except Exception as e:
+                if _is_rate_limited(e) and attempt < MAX_RETRIES:
+                    delay = RETRY_BACKOFF * (2 ** attempt) + random.uniform(0, 1)
+                    print(f"⏳ Rate limited in batch {i}, retrying in {delay:.1f}s...")
+                    time.sleep(delay)
+                    continue
+                logger.warning("LLM call for batch %d/%d failed: %s", i, total, e)
+                return None  # not the same as "no matches" - the caller must know
+
+    # batch() keeps the input order and caps the number of chunks in flight
+    runner = RunnableLambda(process)
+    batches = runner.batch(
+        list(enumerate(dom_chunks, start=1)),
+        config={"max_concurrency": max_concurrency or MAX_CONCURRENCY},
+    )
+    failed = [index for index, items in enumerate(batches) if items is None]
+    return [items or [] for items in batches], failed
+
+
+def _check_failed(failed, results, strict):
+    """Raise ExtractionError (strict) or log that the results are partial"""
+    if not failed:
+        return
+    if strict:
+        raise ExtractionError(failed, results)
+    logger.warning("LLM extraction failed for %d of %d chunks, their results are missing", len(failed), len(results))
+
+def _cache_model_name(llm, model_name):
+    return model_name or getattr(llm, "model_name", None) or type(llm).__name__
+
+def parse_content(dom_chunks, parse_description, api_key=None, model_name=None, max_concurrency=None, llm=None, rate_limiter=None, use_cache=True, flatten=True,
+                  strict=False):
     """
     Parse text chunks using Groq
+    flatten=False returns one item list per chunk instead of a single flat list
+    Chunks that still fail after retries are logged and left out, strict=True raises ExtractionError instead.
+    Chunks run concurrently (max_concurrency) under the shared RPM/TPM limiter,
+    429s are retried with backoff, results come back in chunk order.
+    Chunks already answered for the same model/prompt/description come from the LLM cache.
+    Pass any LangChain chat model as `llm` (e.g. FakeListChatModel) to run offline.
     """
-    llm = get_llm(api_key, model_name)
+    if llm is None:
+        llm = get_llm(api_key, model_name)
+        model_name = model_name or DEFAULT_MODEL
+    cache_model = _cache_model_name(llm, model_name)
+    cache = get_llm_cache() if use_cache and LLM_CACHE_PATH else None
+
     prompt = ChatPromptTemplate.from_template(template)
     chain = prompt | llm
+
+    def call(chunk):
+        response = chain.invoke({
+            "dom_content": chunk,  # Pass the full chunk
+            "parse_description": parse_description
+        })
+        _record_tokens(response, estimate_tokens(template + parse_description + chunk))
+        return _clean_items(_response_text(response))
+
+    batches, failed = _run_chunks(
+        dom_chunks, call, cache=cache,
+        cache_key=lambda chunk: LLMCache.key(cache_model, template, parse_description, chunk),
+        max_concurrency=max_concurrency, rate_limiter=rate_limiter,
+        prompt_text=template + parse_description,
+    )
+    _check_failed(failed, batches, strict)
+
+    if not flatten:
+        return batches
+
     parsed_results = []
+    for items in batches:
+        parsed_results.extend(items)
+    return parsed_results  # Return flat list of all extracted items
 
-    for i, chunk in enumerate(dom_chunks, start=1):
-        print(f"🧠 Processing batch {i}/{len(dom_chunks)}...")
-        
-        try:
-            response = chain.invoke({
-                "dom_content": chunk,  # Pass the full chunk
-                "parse_description": parse_description
-            })
-            
-            # Extract text from response
-            if hasattr(response, 'content'):
-                result_text = response.content.strip()
-            elif isinstance(response, str):
-                result_text = response.strip()
-            else:
-                result_text = str(response).strip()
-            
-            # Split by newline to get individual items
-            items = [item.strip() for item in result_text.split('\n') if item.strip()]
-            
-            # Filter out common "not found" phrases
-            clean_items = []
-            for item in items:
-                clean_item = item.lower().strip('"').strip("'")
-                if clean_item not in ['none', 'no data found', 'n/a', 'no information found', '', 'empty string']:
-                    clean_items.append(item.strip('"').strip("'"))
-            
-            parsed_results.extend(clean_items)
-            
-        except Exception as e:
-            print(f"⚠️ Error in batch {i}: {e}")
-            # No action needed, just skip
-
-    return parsed_results  # Return flat list of all extracted items
\ No newline at end of file
+
+# 🧱 Structured (schema) extraction
+structured_template = """Extract every record matching: {parse_description}
+Each record has these fields:
+{fields}
+
+From this content:
+{dom_content}
+
+Return ONLY a JSON array of objects using exactly these keys.
+Use null when a field is missing. Return [] if there are no matching records.
+Do not add explanations or markdown."""
+
+# Supported field types and how raw values are coerced
+FIELD_TYPES = ("str", "int", "float", "bool", "url")
+
+# Cheap regex hints used to skip chunks that cannot contain a record
+CURRENCY_RE = r"[$€£¥₹]\s?\d|\d[\d,.]*\s?(?:usd|eur|gbp|inr|rs\.?|dollars?)\b"
+FIELD_HINTS = {
+    "price": CURRENCY_RE,
+    "cost": CURRENCY_RE,
+    "amount": CURRENCY_RE,
+    "salary": CURRENCY_RE,
+    "url": r"https?://|www\.|\.\w{2,4}/",
+    "link": r"https?://|www\.|\.\w{2,4}/",
+    "email": r"[\w.+-]+@[\w-]+\.[\w.]+",
+    "phone": r"\+?\d[\d\s().-]{6,}\d",
+    "date": r"\b\d{1,4}[/.-]\d{1,2}[/.-]\d{1,4}\b|\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+\d",
+    "rating": r"\d(?:\.\d)?\s*(?:/\s*\d|out of|stars?|★)",
+}
+TYPE_HINTS = {"int": r"\d", "float": r"\d"}
+
+def normalize_schema(schema):
+    """Accept {"name": "str", ...} or ["name", ...] and return {field: type}"""
+    if isinstance(schema, dict):
+        fields = {str(name): (kind or "str").lower() for name, kind in schema.items()}
+    else:
+        fields = {str(name): "str" for name in schema}
+    unknown = {kind for kind in fields.values() if kind not in FIELD_TYPES}
+    if unknown:
+        raise ValueError(f"Unsupported field types: {', '.join(sorted(unknown))} (use {', '.join(FIELD_TYPES)})")
+    return fields
+
+def build_prefilter(schema, hints=None):
+    """
+    Compile the regex hints for a schema (field names like price/url/email, numeric types)
+    plus any extra `hints` (regexes or plain keywords). For fields with a hint the field name's
+    own words count too ("Price: 19.99" has no currency symbol). Returns None when nothing can be derived.
+    """
+    patterns = list(hints or [])
+    for name, kind in normalize_schema(schema).items():
+        lowered = name.lower()
+        matched = [regex for key, regex in FIELD_HINTS.items() if key in lowered]
+        matched = matched or ([TYPE_HINTS[kind]] if kind in TYPE_HINTS else [])
+        if matched:
+            patterns.extend(matched)
+            patterns.extend(re.escape(word) for word in re.split(r"[\W_]+", lowered) if len(word) >= 3)
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{p})" for p in dict.fromkeys(patterns)), re.IGNORECASE)
+
+def prefilter_chunks(dom_chunks, schema, hints=None):
+    """
+    Drop chunks with no candidate match for the schema (no LLM call needed for them)
+    When no chunk matches at all the hints are the likelier miss, so every chunk is kept
+    """
+    dom_chunks = list(dom_chunks)
+    pattern = build_prefilter(schema, hints)
+    if pattern is None:
+        return dom_chunks
+    kept = [chunk for chunk in dom_chunks if pattern.search(chunk)]
+    if not kept and dom_chunks:
+        print("🔎 Pre-filter matched no chunk, sending all of them")
+        return dom_chunks
+    return kept
+
+def _coerce(value, kind):
+    if value is None:
+        return None
+    if kind in ("str", "url"):
+        value = str(value).strip()
+        return value or None
+    if kind == "bool":
+        if isinstance(value, bool):
+            return value
+        return str(value).strip().lower() in ("true", "yes", "1", "y")
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value) if kind == "int" else float(value)
+
+    # "$1,299.00" -> 1299.0
+    match = re.search(r"-?\d[\d,]*(?:\.\d+)?", str(value))
+    if not match:
+        return None
+    number = float(match.group(0).replace(",", ""))
+    return int(number) if kind == "int" else number
+
+def _parse_json_records(text):
+    """Pull the JSON array out of a model reply (tolerates code fences / stray text)"""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.find("\n") + 1:] if "\n" in text else text
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end < start:
+        # A single object is still one record
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end < start:
+            return []
+        return [json.loads(text[start:end + 1])]
+    return json.loads(text[start:end + 1])
+
+def _records_schema(fields):
+    json_types = {"str": "string", "url": "string", "int": "integer", "float": "number", "bool": "boolean"}
+    return {
+        "title": "extracted_records",
+        "description": "Records extracted from the page content",
+        "type": "object",
+        "properties": {
+            "records": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {name: {"type": [json_types[kind], "null"]} for name, kind in fields.items()},
+                    "required": list(fields),
+                },
+            }
+        },
+        "required": ["records"],
+    }
+
+def parse_structured(dom_chunks, schema, parse_description="", api_key=None, model_name=None, max_concurrency=None,
+                     llm=None, rate_limiter=None, use_cache=True, hints=None, prefilter=True, flatten=True, strict=False):
+    """
+    Schema-driven extraction - returns a list of typed row dicts (one key per schema field)
+    - schema: {"name": "str", "price": "float", "url": "url"} or a list of field names
+    - chunks without any candidate match (see build_prefilter) are skipped before the LLM
+    - uses tool-calling structured output when the model supports it, JSON-in-text otherwise
+    flatten=False returns one row list per input chunk (empty for skipped chunks)
+    Chunks that still fail after retries are logged and left out, strict=True raises ExtractionError instead.
+    """
+    fields = normalize_schema(schema)
+    all_chunks = list(dom_chunks)
+    if prefilter:
+        kept = set(prefilter_chunks(all_chunks, fields, hints))
+        if len(kept) < len(set(all_chunks)):
+            print(f"🔎 Pre-filter skipped {len(set(all_chunks)) - len(kept)}/{len(set(all_chunks))} chunks")
+        dom_chunks = [chunk for chunk in all_chunks if chunk in kept]
+    if not dom_chunks:
+        return [[] for _ in all_chunks] if not flatten else []
+
+    if llm is None:
+        llm = get_llm(api_key, model_name)
+        model_name = model_name or DEFAULT_MODEL
+    cache_model = _cache_model_name(llm, model_name)
+    cache = get_llm_cache() if use_cache and LLM_CACHE_PATH else None
+
+    description = parse_description or "records with the fields below"
+    field_lines = "\n".join(f"- {name} ({kind})" for name, kind in fields.items())
+    prompt = ChatPromptTemplate.from_template(structured_template)
+
+    # Prefer native tool-calling output, fall back to parsing JSON from plain text
+    # include_raw keeps the AI message, so token usage comes from the provider instead of an estimate
+    try:
+        structured_chain = prompt | llm.with_structured_output(_records_schema(fields), include_raw=True)
+    except (NotImplementedError, AttributeError):
+        structured_chain = None
+    text_chain = prompt | llm
+
+    def call(chunk):
+        inputs = {"dom_content": chunk, "parse_description": description, "fields": field_lines}
+        prompt_tokens = estimate_tokens(structured_template + description + field_lines + chunk)
+        if structured_chain is not None:
+            output = structured_chain.invoke(inputs) or {}
+            if output.get("parsing_error") is not None:
+                print(f"⚠️ Structured output could not be parsed: {output['parsing_error']}")
+            result = output.get("parsed") or {}
+            records = result.get("records", []) if isinstance(result, dict) else []
+            _record_tokens(output.get("raw"), prompt_tokens, output_text=json.dumps(result, default=str))
+        else:
+            response = text_chain.invoke(inputs)
+            _record_tokens(response, prompt_tokens)
+            records = _parse_json_records(_response_text(response))
+
+        rows = []
+        for record in records:
+            if not isinstance(record, dict):
+                continue
+            row = {name: _coerce(record.get(name), kind) for name, kind in fields.items()}
+            if any(value is not None for value in row.values()):
+                rows.append(row)
+        return rows
+
+    schema_key = json.dumps(fields, sort_keys=True)
+    batches, failed = _run_chunks(
+        dom_chunks, call, cache=cache,
+        cache_key=lambda chunk: LLMCache.key(cache_model, structured_template + schema_key, description, chunk),
+        max_concurrency=max_concurrency, rate_limiter=rate_limiter,
+        prompt_text=structured_template + description + field_lines,
+    )
+    by_chunk = dict(zip(dom_chunks, batches))
+    if failed:
+        # Report positions in the caller's chunk list, not in the pre-filtered one
+        failed_chunks = {dom_chunks[index] for index in failed}
+        failed = [index for index, chunk in enumerate(all_chunks) if chunk in failed_chunks]
+        _check_failed(failed, [by_chunk.get(chunk, []) for chunk in all_chunks], strict)
+
+    if not flatten:
+        return [by_chunk.get(chunk, []) for chunk in all_chunks]
+
+    rows = []
+    for batch_rows in batches:
+        rows.extend(batch_rows)
+    return rows
@@ -0,0 +1,172 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from http_session import get_session
+
+
+class ProxyStats:
+    """Health record for one proxy"""
+
+    def __init__(self):
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.latency = None  # moving average in seconds
+
+    def record(self, ok, latency=None):
+        if ok:
+            self.successes += 1
+            self.consecutive_failures = 0
+            if latency is not None:
+                self.latency = latency if self.latency is None else 0.7 * self.latency + 0.3 * latency
+        else:
+            self.failures += 1
+            self.consecutive_failures += 1
+
+    @property
+    def success_rate(self):
+        # Smoothed so a brand new proxy starts at 50%
+        return (self.successes + 1) / (self.successes + self.failures + 2)
+
+
+class ProxyPool:
+    """
+    Long-lived proxy pool
+    - refreshes the proxy list in a background thread once it is older than `ttl`
+    - tracks success rate and latency per proxy, evicts proxies after `max_failures` failures in a row
+    - hands out the fastest healthy proxies without blocking the caller
+    `loader` is any callable returning a list of proxy URLs ("http://host:port")
+    """
+
+    def __init__(self, loader, ttl=300, max_failures=3, timeout=5, dead_ttl=1800):
+        self.loader = loader
+        self.ttl = ttl
+        self.max_failures = max_failures
+        self.timeout = timeout
+        self.dead_ttl = dead_ttl
+
+        self._stats = {}
+        self._dead = {}  # proxy -> evicted at
+        self._loaded_at = None
+        self._refreshing = False
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="proxy-race")
+
+    # --- list management ---
+
+    def refresh(self):
+        """Reload the proxy list now (blocking), keeping stats for proxies we already know"""
+        try:
+            proxies = self.loader() or []
+        except Exception as e:
+            print(f"Proxy list refresh failed: {e}")
+            proxies = None
+
+        now = time.monotonic()
+        with self._lock:
+            if proxies is not None:
+                self._dead = {p: t for p, t in self._dead.items() if now - t < self.dead_ttl}
+                for proxy in proxies:
+                    if proxy not in self._stats and proxy not in self._dead:
+                        self._stats[proxy] = ProxyStats()
+            self._loaded_at = now
+            self._refreshing = False
+        self._ready.set()
+
+    def _maybe_refresh(self):
+        with self._lock:
+            stale = self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+            if not stale or self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self.refresh, name="proxy-refresh", daemon=True).start()
+
+    def wait_ready(self, timeout=None):
+        """Block until the first proxy list has been loaded (useful for tests / warm-up)"""
+        self._maybe_refresh()
+        return self._ready.wait(timeout)
+
+    # --- health tracking ---
+
+    def report(self, proxy, ok, latency=None):
+        """Record the outcome of a request made through `proxy`"""
+        with self._lock:
+            stats = self._stats.get(proxy)
+            if stats is None:
+                return
+            stats.record(ok, latency)
+            if stats.consecutive_failures >= self.max_failures:
+                del self._stats[proxy]
+                self._dead[proxy] = time.monotonic()
+
+    def _score(self, stats):
+        # Lower is better: expected latency divided by the chance of success
+        latency = stats.latency if stats.latency is not None else self.timeout / 2
+        return latency / stats.success_rate
+
+    def best(self, n=1):
+        """Return up to `n` healthy proxies, fastest first (empty while the list is still loading)"""
+        self._maybe_refresh()
+        with self._lock:
+            ranked = sorted(self._stats.items(), key=lambda item: self._score(item[1]))
+        return [proxy for proxy, _ in ranked[:n]]
+
+    def get(self):
+        """Return the best healthy proxy, or None"""
+        proxies = self.best(1)
+        return proxies[0] if proxies else None
+
+    def stats(self):
+        """Snapshot of the pool as a list of dicts"""
+        with self._lock:
+            return [
+                {
+                    "proxy": proxy,
+                    "successes": s.successes,
+                    "failures": s.failures,
+                    "success_rate": round(s.success_rate, 3),
+                    "latency": s.latency,
+                }
+                for proxy, s in self._stats.items()
+            ]
+
+    # --- fetching ---
+
+    def _request(self, proxy, url, **kwargs):
+        start = time.monotonic()
+        try:
+            response = get_session(retry=False).get(
+                url, proxies={"http": proxy, "https": proxy}, timeout=self.timeout, **kwargs
+            )
+        except Exception:
+            self.report(proxy, False)
+            raise
+        ok = response.status_code in (200, 304)  # 304 answers a conditional (cached) request
+        self.report(proxy, ok, time.monotonic() - start)
+        if not ok:
+            raise RuntimeError(f"{proxy} returned {response.status_code}")
+        return response
+
+    def fetch(self, url, race=2, attempts=2, **kwargs):
+        """
+        GET `url` through the pool - races `race` proxies at a time and returns the
+        first 200/304 response, tries up to `attempts` rounds, returns None if nothing worked
+        """
+        tried = set()
+        for _ in range(attempts):
+            candidates = [p for p in self.best(race + len(tried)) if p not in tried][:race]
+            if not candidates:
+                return None
+            tried.update(candidates)
+
+            futures = [self._executor.submit(self._request, proxy, url, **kwargs) for proxy in candidates]
+            for future in as_completed(futures):
+                try:
+                    response = future.result()
+                except Exception:
+                    continue
+                # Losers keep running in the background only to update their stats
+                return response
+        return None
@@ -0,0 +1,315 @@
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from async_fetch import polite_call
+from chunker import MAX_CHUNK_TOKENS, count_tokens, extract_blocks
+from doc_cache import parse_document
+from http_session import get_session
+
+RecrawlResult = namedtuple("RecrawlResult", ["merged", "delta", "stats"])
+
+# Column that identifies "the same" row across runs, so edits show up as "changed"
+ROW_KEYS = {"links": "url", "images": "src"}
+
+PAGE_ROWS = ""  # block path used for whole-page (non-AI) rows
+
+
+def _hash(text):
+    return hashlib.sha256(text.encode("utf-8", errors="replace")).hexdigest()
+
+
+class CrawlState:
+    """
+    SQLite store of what the last crawl saw
+    - pages:  url -> ETag, Last-Modified, content hash, extraction settings
+    - blocks: (url, block key) -> block hash, extraction group, extracted rows
+      (the key is content based, see _content_keys - stored in the `path` column)
+    """
+
+    def __init__(self, path=".crawl_state.sqlite"):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                settings TEXT,
+                fetched_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS blocks (
+                url TEXT,
+                path TEXT,
+                block_hash TEXT,
+                grp TEXT,
+                rows TEXT,
+                position INTEGER,
+                PRIMARY KEY (url, path)
+            );
+        """)
+        self._db.commit()
+
+    def page(self, url):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, last_modified, content_hash, settings FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("etag", "last_modified", "content_hash", "settings"), row))
+
+    def blocks(self, url):
+        """{path: {"hash", "group", "rows"}} in document order"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT path, block_hash, grp, rows FROM blocks WHERE url = ? ORDER BY position", (url,)
+            ).fetchall()
+        return {path: {"hash": h, "group": g, "rows": json.loads(r)} for path, h, g, r in rows}
+
+    def save(self, url, etag, last_modified, content_hash, settings, blocks):
+        """Replace everything stored for `url` - blocks is {path: {"hash", "group", "rows"}} in order"""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, content_hash, settings, time.time()),
+            )
+            self._db.execute("DELETE FROM blocks WHERE url = ?", (url,))
+            self._db.executemany(
+                "INSERT INTO blocks VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (url, path, block["hash"], block["group"], json.dumps(block["rows"]), position)
+                    for position, (path, block) in enumerate(blocks.items())
+                ],
+            )
+            self._db.commit()
+
+    def touch(self, url, etag, last_modified):
+        with self._lock:
+            self._db.execute(
+                "UPDATE pages SET etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified), fetched_at = ? WHERE url = ?",
+                (etag, last_modified, time.time(), url),
+            )
+            self._db.commit()
+
+
+def diff_rows(old_rows, new_rows, key=None):
+    """
+    Compare two row lists - returns [(change, row)] with change in added / removed / changed
+    Rows sharing the same `key` value but differing elsewhere are reported once as "changed"
+    """
+    freeze = lambda row: json.dumps(row, sort_keys=True)
+    old_counts = Counter(freeze(r) for r in old_rows)
+    new_counts = Counter(freeze(r) for r in new_rows)
+    removed = [json.loads(r) for r, n in (old_counts - new_counts).items() for _ in range(n)]
+    added = [json.loads(r) for r, n in (new_counts - old_counts).items() for _ in range(n)]
+
+    delta = []
+    if key:
+        removed_by_key = {}
+        for row in removed:
+            removed_by_key.setdefault(row.get(key), []).append(row)
+        still_added = []
+        for row in added:
+            matches = removed_by_key.get(row.get(key))
+            if matches:
+                matches.pop()
+                delta.append(("changed", row))
+            else:
+                still_added.append(row)
+        added = still_added
+        removed = [row for rows in removed_by_key.values() for row in rows]
+
+    delta.extend(("added", row) for row in added)
+    delta.extend(("removed", row) for row in removed)
+    return delta
+
+
+def _conditional_fetch(url, page, use_proxies):
+    """GET with If-None-Match / If-Modified-Since from the stored state (politely scheduled)"""
+    import scraper_main
+
+    headers = {"User-Agent": random.choice(scraper_main.USER_AGENTS)}
+    if page and page.get("etag"):
+        headers["If-None-Match"] = page["etag"]
+    if page and page.get("last_modified"):
+        headers["If-Modified-Since"] = page["last_modified"]
+
+    def send():
+        if use_proxies and scraper_main.PROXY_SOURCE_URL:
+            response = scraper_main.get_proxy_pool().fetch(url, headers=headers, verify=False)
+            if response is not None:
+                return response
+        return get_session().get(url, headers=headers, timeout=15, verify=False)
+
+    response = polite_call(url, send)
+    if response.status_code != 304:
+        response.raise_for_status()
+    return response
+
+
+def _content_keys(blocks):
+    """
+    Key blocks by a hash of their text instead of their DOM position, so inserting or removing
+    one block does not shift the keys of everything after it; identical blocks are numbered
+    """
+    seen = Counter()
+    keyed = []
+    for block in blocks:
+        key = _hash(block.text)[:16]
+        seen[key] += 1
+        n = seen[key]
+        keyed.append(block._replace(path=key if n == 1 else f"{key}#{n}"))
+    return keyed
+
+
+def _group_blocks(blocks, model_name):
+    """Pack blocks into LLM-sized groups -> [(head path, [blocks])]"""
+    groups = []
+    current, tokens = [], 0
+    for block in blocks:
+        n = count_tokens(block.text, model_name)
+        if current and tokens + n > MAX_CHUNK_TOKENS:
+            groups.append(current)
+            current, tokens = [], 0
+        current.append(block)
+        tokens += n
+    if current:
+        groups.append(current)
+    return [(group[0].path, group) for group in groups]
+
+
+def _extract_ai(blocks, old_blocks, parse_text, schema, api_key, model_name):
+    """
+    AI mode: only groups that contain a new/changed block (or lost a block) are sent to the LLM,
+    the rows of every other group are reused. Returns (new block map, old rows, new rows) for the delta.
+    Raises parse.ExtractionError if any group failed, so the page is not saved and is retried next run.
+    """
+    from parse import parse_content, parse_structured
+
+    current = {block.path: _hash(block.text) for block in blocks}
+    changed = {path for path, h in current.items() if old_blocks.get(path, {}).get("hash") != h}
+    removed = set(old_blocks) - set(current)
+    dirty_groups = {old_blocks[p]["group"] for p in (changed | removed) if p in old_blocks}
+    redo = [b for b in blocks if b.path in changed or old_blocks.get(b.path, {}).get("group") in dirty_groups]
+    redo_paths = {b.path for b in redo}
+
+    groups = _group_blocks(redo, model_name)
+    chunks = ["\n".join(b.text for b in group) for _, group in groups]
+    if not chunks:
+        results = []
+    elif schema:
+        results = parse_structured(chunks, schema, parse_text or "", api_key=api_key, model_name=model_name, flatten=False,
+                                   strict=True)
+    else:
+        results = parse_content(chunks, parse_text, api_key=api_key, model_name=model_name, flatten=False, strict=True)
+        results = [[{"Extracted Data": item} for item in items] for items in results]
+
+    new_group_of = {}
+    new_group_rows = {}
+    for (head, group), rows in zip(groups, results):
+        new_group_rows[head] = rows
+        for block in group:
+            new_group_of[block.path] = head
+
+    merged = {}
+    for block in blocks:
+        if block.path in redo_paths:
+            head = new_group_of[block.path]
+            rows = new_group_rows[head] if head == block.path else []
+            merged[block.path] = {"hash": current[block.path], "group": head, "rows": rows}
+        else:
+            merged[block.path] = old_blocks[block.path]
+
+    old_rows = [r for p, b in old_blocks.items() if b["group"] in dirty_groups or p in removed for r in b["rows"]]
+    new_rows = [r for rows in new_group_rows.values() for r in rows]
+    return merged, old_rows, new_rows, len(chunks)
+
+
+def recrawl(urls, state_path=".crawl_state.sqlite", tag_type="alltext", custom_tag=None, parse_text=None, schema=None,
+            api_key=None, model_name=None, use_proxies=False, max_workers=8):
+    """
+    Incremental re-scrape of `urls` against a persistent CrawlState
+    - unchanged pages (304, or same content hash) are not parsed or extracted again
+    - with AI extraction only the DOM blocks that changed are re-sent to the LLM
+    - a page whose LLM extraction failed keeps its previous state (counted as failed), so it is retried next run
+    Returns RecrawlResult(merged, delta, stats):
+      merged - all current rows with a source_url column
+      delta  - rows with a "change" column (added / removed / changed) since the last run
+    """
+    from scraper_main import _normalize_targets, extract_data
+
+    state = CrawlState(state_path)
+    settings = json.dumps([tag_type, custom_tag, parse_text, schema, model_name], sort_keys=True, default=str)
+    use_ai = bool(parse_text or schema)
+    key = ROW_KEYS.get(tag_type)
+    if schema:
+        key = next(iter(schema))
+    stats = Counter()
+
+    def process(url):
+        page = state.page(url)
+        if page and page["settings"] != settings:
+            page = None  # extraction settings changed - treat as a first visit
+        old_blocks = state.blocks(url) if page else {}
+
+        response = _conditional_fetch(url, page, use_proxies)
+        etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+        if response.status_code == 304:
+            state.touch(url, etag, last_modified)
+            stats["not_modified"] += 1
+            return url, old_blocks, []
+
+        html = response.text
+        content_hash = _hash(html)
+        if page and page["content_hash"] == content_hash:
+            state.touch(url, etag, last_modified)
+            stats["unchanged"] += 1
+            return url, old_blocks, []
+
+        soup = parse_document(html)
+        if use_ai:
+            blocks = _content_keys(extract_blocks(soup, model_name=model_name, drop_repeated=False))
+            new_blocks, old_rows, new_rows, calls = _extract_ai(blocks, old_blocks, parse_text, schema, api_key, model_name)
+            stats["llm_chunks"] += calls
+        else:
+            new_rows = extract_data(soup, tag_type, limit=None, custom_tag=custom_tag)
+            new_blocks = {PAGE_ROWS: {"hash": content_hash, "group": PAGE_ROWS, "rows": new_rows}}
+            old_rows = [r for b in old_blocks.values() for r in b["rows"]]
+
+        state.save(url, etag, last_modified, content_hash, settings, new_blocks)
+        stats["changed" if page else "new"] += 1
+        return url, new_blocks, diff_rows(old_rows, new_rows, key)
+
+    merged_frames, delta_rows = [], []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(process, url): url for url in _normalize_targets(urls)}
+        for future, url in futures.items():
+            try:
+                url, blocks, delta = future.result()
+            except Exception as e:
+                print(f"Failed to recrawl {url}: {e}")
+                stats["failed"] += 1
+                continue
+            rows = [r for b in blocks.values() for r in b["rows"]]
+            if rows:
+                merged_frames.append(pd.DataFrame(rows).assign(source_url=url))
+            delta_rows.extend({"change": change, "source_url": url, **row} for change, row in delta)
+
+    merged = pd.concat(merged_frames, ignore_index=True) if merged_frames else pd.DataFrame(columns=["source_url"])
+    merged = merged[["source_url"] + [c for c in merged.columns if c != "source_url"]]
+    delta = pd.DataFrame(delta_rows, columns=None if delta_rows else ["change", "source_url"])
+    return RecrawlResult(merged, delta, dict(stats))
@@ -0,0 +1,238 @@
+"""
+Compact, column-oriented result building for large extractions
+
+Rows are appended straight into per-column buffers instead of a list of dicts.
+String values are interned per column (stored once, rows keep a small integer code),
+so repeated heading tags, alt texts or source URLs cost 4 bytes per row.
+Low-cardinality columns become categoricals, the rest Arrow-backed strings.
+"""
+from array import array
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Column order of the rows each tag type produces (see scraper_main.iter_rows)
+COLUMNS = {
+    "alltext": ("content",),
+    "images": ("src", "alt"),
+    "links": ("text", "url"),
+    "headings": ("tag", "text"),
+    "paragraphs": ("text",),
+    "customtag": ("content",),
+}
+
+# Columns stored as categoricals whatever their cardinality
+CATEGORICAL_COLUMNS = {"tag", "source_url", "type"}
+CATEGORY_RATIO = 0.5  # other columns become categorical when distinct values / rows is at most this
+INTERN_SAMPLE = 1024  # rows looked at before a mostly-unique column stops being interned
+EXTEND_BATCH = 4096   # rows transposed at a time by ResultBuilder.extend
+
+
+def columns_for(tag_type):
+    return COLUMNS.get(tag_type, COLUMNS["alltext"])
+
+
+def _string_dtype():
+    """Arrow-backed strings when pyarrow is available (the default from pandas 3 on)"""
+    if int(pd.__version__.split(".", 1)[0]) >= 3:
+        return "str"
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return object
+    return "string[pyarrow]"
+
+
+STRING_DTYPE = _string_dtype()
+
+
+class _Column:
+    """
+    Interned values of one column - codes index into `values`, -1 is missing
+    Interning stops (values are kept as a plain list) once at least INTERN_SAMPLE rows are
+    mostly distinct, and for anything but strings (True, 1 and 1.0 are equal dict keys).
+    """
+
+    def __init__(self, category_ratio=CATEGORY_RATIO):
+        self.codes = array("i")
+        self.values = []
+        self._index = {}
+        self.category_ratio = category_ratio
+        self.plain = None
+        self.strings = True
+
+    def append(self, value):
+        if self.plain is not None:
+            if self.strings and value is not None and type(value) is not str:
+                self.strings = False
+            self.plain.append(value)
+        elif value is None:
+            self.codes.append(-1)
+        elif type(value) is str:
+            code = self._index.get(value)
+            if code is None:
+                code = self._index[value] = len(self.values)
+                self.values.append(value)
+            self.codes.append(code)
+            if len(self.codes) == INTERN_SAMPLE and len(self.values) > self.category_ratio * INTERN_SAMPLE:
+                self._expand()  # mostly unique text, interning only costs hashing
+        else:
+            self._expand()
+            self.append(value)
+
+    def extend(self, values):
+        if self.plain is None and len(self.codes) < INTERN_SAMPLE < len(self.codes) + len(values):
+            head = INTERN_SAMPLE - len(self.codes)  # decide at the sample size, not at the end of the batch
+            self.extend(values[:head])
+            self.extend(values[head:])
+            return
+        if self.plain is None:
+            index, codes, uniques = self._index, self.codes, self.values
+            for i, value in enumerate(values):
+                if type(value) is str:
+                    code = index.get(value)
+                    if code is None:
+                        code = index[value] = len(uniques)
+                        uniques.append(value)
+                    codes.append(code)
+                elif value is None:
+                    codes.append(-1)
+                else:
+                    self._expand()
+                    self.extend(values[i:])
+                    return
+            if len(codes) >= INTERN_SAMPLE and len(uniques) > self.category_ratio * len(codes):
+                self._expand()  # mostly unique text, interning only costs hashing
+        else:
+            if self.strings and not all(type(v) is str or v is None for v in values):
+                self.strings = False
+            self.plain.extend(values)
+
+    def _expand(self):
+        self.plain = [self.values[c] if c >= 0 else None for c in self.codes]
+        self.codes = self.values = self._index = None
+
+    @property
+    def distinct(self):
+        return len(self.values) if self.plain is None else None
+
+    def to_array(self, categorical):
+        if self.plain is not None:
+            # Non-string values get the same inference as pd.DataFrame(rows)
+            return pd.array(self.plain, dtype=STRING_DTYPE) if self.strings else pd.Series(self.plain)
+        codes = np.frombuffer(self.codes, dtype=np.int32) if self.codes else np.empty(0, dtype=np.int32)
+        if categorical:
+            # Sorted categories, so sort_values / groupby order is the same as for plain strings
+            order = np.argsort(np.array(self.values, dtype=object)) if self.values else np.empty(0, dtype=np.intp)
+            rank = np.empty(len(order) + 1, dtype=np.int32)
+            rank[order] = np.arange(len(order), dtype=np.int32)
+            rank[-1] = -1
+            categories = pd.Index([self.values[i] for i in order], dtype=STRING_DTYPE)
+            return pd.Categorical.from_codes(rank[codes], categories=categories)
+        values = np.array(self.values + [None], dtype=object)
+        return pd.array(values[codes], dtype=STRING_DTYPE)
+
+
+class ResultBuilder:
+    """
+    Append rows (tuples in `columns` order) and get one compact DataFrame at the end
+    Stops accepting rows once `limit` is reached, so the rest of a page is never materialized.
+    """
+
+    def __init__(self, columns, limit=None, categorical=CATEGORICAL_COLUMNS, category_ratio=CATEGORY_RATIO):
+        self.columns = tuple(columns)
+        self.limit = limit or None
+        self.categorical = set(categorical)
+        self.category_ratio = category_ratio
+        self._columns = [_Column(category_ratio) for _ in self.columns]
+        self._rows = 0
+
+    def __len__(self):
+        return self._rows
+
+    @property
+    def full(self):
+        return self.limit is not None and self._rows >= self.limit
+
+    def append(self, row):
+        """Add one row, returns False (and drops it) once the limit is reached"""
+        if self.full:
+            return False
+        for column, value in zip(self._columns, row):
+            column.append(value)
+        self._rows += 1
+        return True
+
+    def extend(self, rows):
+        """Add rows until the limit, without pulling more from `rows` than needed"""
+        rows = iter(rows)
+        if self.limit is not None:
+            rows = islice(rows, max(0, self.limit - self._rows))
+        while True:
+            # Column by column in batches - far fewer calls than value by value
+            batch = list(islice(rows, EXTEND_BATCH))
+            if not batch:
+                return self
+            for column, values in zip(self._columns, zip(*batch)):
+                column.extend(values)
+            self._rows += len(batch)
+
+    def to_frame(self):
+        data = {}
+        for name, column in zip(self.columns, self._columns):
+            categorical = column.distinct is not None and (name in self.categorical or (
+                self._rows > 1 and column.distinct <= self.category_ratio * self._rows
+            ))
+            data[name] = column.to_array(categorical)
+        return pd.DataFrame(data, columns=list(self.columns))
+
+
+def build_frame(rows, columns, limit=None):
+    """DataFrame from row tuples through a ResultBuilder"""
+    return ResultBuilder(columns, limit=limit).extend(rows).to_frame()
+
+
+def frame_from_dicts(rows, columns=None, limit=None):
+    """DataFrame from row dicts (as returned by extract_data / extract_many)"""
+    rows = rows[:limit] if limit else rows
+    if columns is None:
+        columns = tuple(dict.fromkeys(key for row in rows for key in row))
+    return build_frame((tuple(row.get(c) for c in columns) for row in rows), columns)
+
+
+def _concat_column(parts):
+    """Concatenate one column, merging categoricals instead of expanding them to strings"""
+    categorical = [isinstance(part.dtype, pd.CategoricalDtype) for part in parts]
+    if all(categorical):
+        return pd.Series(union_categoricals(parts, sort_categories=True))
+    if any(categorical):
+        # Pages disagreed on the cardinality - fall back to strings rather than object
+        parts = [part.astype(STRING_DTYPE) if is_categorical else part for part, is_categorical in zip(parts, categorical)]
+    return pd.concat(parts, ignore_index=True)
+
+
+def combine_frames(results, key="source_url"):
+    """
+    Concatenate (label, DataFrame) pairs into one DataFrame with a leading categorical `key` column
+    Categorical columns are merged category-wise, so the combined frame stays compact.
+    """
+    labels, frames = [], []
+    for label, df in results:
+        if df is not None and not df.empty:
+            labels.append(label)
+            frames.append(df.drop(columns=[key], errors="ignore"))
+    if not frames:
+        return pd.DataFrame(columns=[key])
+
+    columns = list(dict.fromkeys(c for df in frames for c in df.columns))
+    if all(list(df.columns) == columns for df in frames):
+        combined = pd.DataFrame({c: _concat_column([df[c] for df in frames]) for c in columns}, columns=columns)
+    else:
+        combined = pd.concat(frames, ignore_index=True)
+
+    # One label per frame, repeated by codes rather than copied onto every row
+    source = pd.Categorical(pd.array(labels, dtype=STRING_DTYPE))
+    combined.insert(0, key, source.take(np.repeat(np.arange(len(frames)), [len(df) for df in frames])))
+    return combined
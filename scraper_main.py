@@ -1,8 +1,25 @@
-import requests
-from bs4 import BeautifulSoup
+from bs4 import CData, NavigableString, Tag
 import pandas as pd
-import time
+import soupsieve
+import functools
 import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+from urllib.parse import urljoin, urlparse
+
+from async_fetch import polite_call
+from chunker import chunk_blocks, chunk_page
+from doc_cache import parse_document
+from exporters import open_writer
+from http_cache import HttpCache
+from http_session import get_session
+from images import download_images_report
+from metrics import inc, observe, span
+from proxy_pool import ProxyPool
+from results import ResultBuilder, build_frame, columns_for, combine_frames, frame_from_dicts
+from streaming import iter_extract
 
 # User agents for rotation
 USER_AGENTS = [
@@ -13,14 +30,22 @@ USER_AGENTS = [
 
 # Global proxy setting
 PROXY_SOURCE_URL = "https://www.proxy-list.download/api/v1/get?type=http"
+PROXY_POOL_SIZE = 50      # proxies kept in the shared pool
+PROXY_POOL_TTL = 300      # seconds before the pool reloads the proxy list
 
-def get_proxies(limit=5):
+# On-disk HTTP response cache (set HTTP_CACHE_DIR to "" to disable)
+HTTP_CACHE_DIR = ".http_cache"
+HTTP_CACHE_TTL = 600                      # seconds before a cached page is revalidated
+HTTP_CACHE_MAX_BYTES = 512 * 1024 * 1024  # LRU eviction above this size
+
+def get_proxies(limit=5, source_url=None):
     """Get list of proxies"""
-    if not PROXY_SOURCE_URL:
+    source_url = source_url or PROXY_SOURCE_URL
+    if not source_url:
         return []
     
     try:
-        response = requests.get(PROXY_SOURCE_URL, timeout=8)
+        response = get_session().get(source_url, timeout=8)
         proxies = []
         for line in response.text.splitlines()[:limit]:
             line = line.strip()
@@ -31,36 +56,218 @@ def get_proxies(limit=5):
     except:
         return []
 
-def fetch_page(url, use_proxies=True):
-    """Fetch webpage with rotating user agents"""
+_proxy_pool = None
+
+def get_proxy_pool():
+    """Shared proxy pool, loaded from PROXY_SOURCE_URL and refreshed in the background"""
+    global _proxy_pool
+    if _proxy_pool is None:
+        _proxy_pool = ProxyPool(lambda: get_proxies(limit=PROXY_POOL_SIZE), ttl=PROXY_POOL_TTL)
+    return _proxy_pool
+
+_http_cache = None
+
+def get_http_cache():
+    """Shared on-disk response cache (HTTP_CACHE_DIR), created on first use"""
+    global _http_cache
+    if _http_cache is None:
+        _http_cache = HttpCache(HTTP_CACHE_DIR, ttl=HTTP_CACHE_TTL, max_bytes=HTTP_CACHE_MAX_BYTES)
+    return _http_cache
+
+def fetch_page(url, use_proxies=True, use_cache=True):
+    """Fetch webpage with rotating user agents (politely scheduled per host)"""
+    # Fresh cache hits skip the network and the politeness wait entirely
+    if use_cache and HTTP_CACHE_DIR:
+        entry = get_http_cache().lookup(url)
+        cached = get_http_cache().read(entry) if entry and get_http_cache().is_fresh(entry) else None
+        if cached is not None:
+            inc("cache_requests", cache="http", result="hit")
+            return cached.text
+    
+    queued = time.perf_counter()
+    def direct():
+        observe("polite_wait", time.perf_counter() - queued)
+        return fetch_page_direct(url, use_proxies=use_proxies, use_cache=use_cache)
+    
+    html = polite_call(url, direct)
+    inc("pages_fetched")
+    return html
+
+def fetch_page_direct(url, use_proxies=True, use_cache=True):
+    """Fetch webpage with rotating user agents, without any politeness delay"""
     headers = {"User-Agent": random.choice(USER_AGENTS)}
-    time.sleep(0.5)  # Polite delay
-    
-    # Try with proxies first
-    if use_proxies:
-        proxies = get_proxies()
-        for proxy in proxies:
-            try:
-                response = requests.get(
-                    url, 
-                    headers=headers, 
-                    proxies={"http": proxy, "https": proxy}, 
-                    timeout=10,
-                    verify=False
-                )
-                if response.status_code == 200:
-                    return response.text
-            except:
-                continue
     
-    # Fallback to direct request
-    response = requests.get(url, headers=headers, timeout=15, verify=False)
+    def send(extra_headers):
+        request_headers = {**headers, **extra_headers}
+        # Try with proxies first (the pool returns None straight away while its list is still loading)
+        if use_proxies and PROXY_SOURCE_URL:
+            with span("proxy"):
+                response = get_proxy_pool().fetch(url, headers=request_headers, verify=False)
+            if response is not None:
+                inc("proxy_requests", result="ok")
+                _record_transfer(response)
+                return response
+            inc("proxy_requests", result="fallback")
+        
+        # Fallback to direct request
+        start = time.perf_counter()
+        response = get_session().get(url, headers=request_headers, timeout=15, verify=False)
+        _record_transfer(response, time.perf_counter() - start)
+        return response
+    
+    if use_cache and HTTP_CACHE_DIR:
+        response = get_http_cache().get(url, send)
+        if getattr(response, "from_cache", False):
+            inc("cache_requests", cache="http", result="revalidated")
+        else:
+            inc("cache_requests", cache="http", result="miss")
+    else:
+        response = send({})
     response.raise_for_status()
     return response.text
 
-def scrape_into_dataframe(url, tag_type="alltext", limit=50, custom_tag=None, parse_text=None, use_proxies=True, api_key=None):
+def _record_transfer(response, total=None):
+    """
+    Bytes and timing of a live response - requests fills `elapsed` once the headers are in
+    (DNS + connect + TLS + server time), the rest of `total` is the body download
+    """
+    inc("bytes_downloaded", len(response.content))
+    if total is None:
+        return
+    ttfb = min(response.elapsed.total_seconds(), total)
+    observe("ttfb", ttfb)
+    observe("download", total - ttfb)
+
+LINE_BREAKS = frozenset("\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029")  # what str.splitlines splits on
+
+def _iter_lines(strings):
+    """
+    Stripped, non-empty lines of "".join(strings).splitlines(), produced lazily
+    so a caller that only wants the first few lines never builds the page text
+    """
+    pending = []
+    for s in strings:
+        for part in s.splitlines(True):
+            if part[-1] not in LINE_BREAKS:
+                pending.append(part)  # the line continues in the next string
+                continue
+            if pending:
+                pending.append(part)
+                part = "".join(pending)
+                pending = []
+            line = part.strip()
+            if line:
+                yield line
+    line = "".join(pending).strip()
+    if line:
+        yield line
+
+def iter_rows(soup, tag_type="alltext", limit=50, custom_tag=None):
+    """
+    Lazily yield rows (tuples in results.COLUMNS order) of the requested tag type
+    Nothing past `limit` rows is searched for or materialized
+    """
+    limit = limit or None
+    if tag_type == "images":
+        for img in soup.find_all("img", src=True, limit=limit):
+            yield img["src"], img.get("alt", "")
+    
+    elif tag_type == "links":
+        for link in soup.find_all("a", href=True, limit=limit):
+            yield link.get_text(strip=True), link["href"]
+    
+    elif tag_type == "headings":
+        for h in soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6"], limit=limit):
+            yield h.name, h.get_text(strip=True)
+    
+    elif tag_type == "paragraphs":
+        for p in soup.find_all("p", limit=limit):
+            yield (p.get_text(strip=True),)
+    
+    elif tag_type == "customtag" and custom_tag:
+        for elem in soup.find_all(custom_tag, limit=limit):
+            yield (elem.get_text(strip=True),)
+    
+    else:  # alltext - default
+        # Read-only: the tree may be shared through the document cache, so skip script/style instead of decomposing
+        strings = (s for s in soup.strings if s.parent.name not in ("script", "style"))
+        if limit is None:
+            # The whole page is wanted - one join + splitlines beats splitting string by string
+            lines = filter(None, (line.strip() for line in "".join(strings).splitlines()))
+        else:
+            lines = islice(_iter_lines(strings), limit)
+        for line in lines:
+            yield (line,)
+
+def extract_data(soup, tag_type="alltext", limit=50, custom_tag=None):
+    """
+    Extract rows (list of dicts) of the requested tag type from a parsed page
+    """
+    columns = columns_for(tag_type)
+    return [dict(zip(columns, row)) for row in iter_rows(soup, tag_type, limit=limit, custom_tag=custom_tag)]
+
+HEADING_TAGS = ("h1", "h2", "h3", "h4", "h5", "h6")
+MULTI_TYPES = ("alltext", "images", "links", "headings", "paragraphs")
+
+def extract_many(soup, types=MULTI_TYPES, limit=50, custom_tags=(), selectors=()):
+    """
+    Single-pass extraction of several content types from one parsed page
+    - types: any of MULTI_TYPES
+    - custom_tags: tag names, each collected under "tag:<name>"
+    - selectors: CSS selectors, each collected under "css:<selector>"
+    Returns {type: list of row dicts} with the same rows as extract_data (elements with an
+    empty src / href included); the prefixes keep custom keys from clashing with built-in types
+    """
+    types = set(types)
+    custom_tags = {tag.lower(): f"tag:{tag.lower()}" for tag in custom_tags if tag}
+    compiled = [(f"css:{selector}", soupsieve.compile(selector)) for selector in dict.fromkeys(selectors) if selector]
+    
+    results = {name: [] for name in types if name != "alltext"}
+    results.update({key: [] for key in custom_tags.values()})
+    results.update({key: [] for key, _ in compiled})
+    
+    def wants(name):
+        return name in results and (not limit or len(results[name]) < limit)
+    
+    strings = []
+    for node in soup.descendants:
+        if isinstance(node, NavigableString):
+            if "alltext" in types and type(node) in (NavigableString, CData) and node.parent.name not in ("script", "style"):
+                strings.append(node)
+            continue
+        if not isinstance(node, Tag):
+            continue
+        
+        name = node.name
+        # Same filter as find_all(src=True / href=True): the attribute is present, even if empty
+        if name == "img" and node.get("src") is not None and wants("images"):
+            results["images"].append({"src": node["src"], "alt": node.get("alt", "")})
+        elif name == "a" and node.get("href") is not None and wants("links"):
+            results["links"].append({"text": node.get_text(strip=True), "url": node["href"]})
+        elif name in HEADING_TAGS and wants("headings"):
+            results["headings"].append({"tag": name, "text": node.get_text(strip=True)})
+        elif name == "p" and wants("paragraphs"):
+            results["paragraphs"].append({"text": node.get_text(strip=True)})
+        
+        if name in custom_tags and wants(custom_tags[name]):
+            results[custom_tags[name]].append({"content": node.get_text(strip=True)})
+        for key, pattern in compiled:
+            if wants(key) and pattern.match(node):
+                results[key].append({"content": node.get_text(strip=True)})
+        
+        # Everything is full and no text is needed - stop walking early
+        if "alltext" not in types and limit and all(len(rows) >= limit for rows in results.values()):
+            break
+    
+    if "alltext" in types:
+        results["alltext"] = [{"content": line} for line in islice(_iter_lines(strings), limit or None)]
+    
+    return results
+
+def scrape_into_dataframe(url, tag_type="alltext", limit=50, custom_tag=None, parse_text=None, use_proxies=True, api_key=None, parser=None, model_name=None, schema=None):
     """
     Main scraping function - extracts data from URL and returns DataFrame
+    Pass a field schema (e.g. {"name": "str", "price": "float"}) for typed multi-column AI extraction
     """
     # Validate URL
     if not url.startswith(('http://', 'https://')):
@@ -68,7 +275,6 @@ def scrape_into_dataframe(url, tag_type="alltext", limit=50, custom_tag=None, pa
     
     # Fetch page
     html = fetch_page(url, use_proxies=use_proxies)
-    soup = BeautifulSoup(html, "html.parser")
     
     # Handle raw HTML mode
     if tag_type == "rawhtml":
@@ -76,65 +282,54 @@ def scrape_into_dataframe(url, tag_type="alltext", limit=50, custom_tag=None, pa
             f.write(html)
         return None
     
-    # Extract based on tag type
-    if tag_type == "images":
-        imgs = soup.find_all("img", src=True)[:limit]
-        data = [{"src": img["src"], "alt": img.get("alt", "")} for img in imgs]
-    
-    elif tag_type == "links":
-        links = soup.find_all("a", href=True)[:limit]
-        data = [{"text": link.get_text(strip=True), "url": link["href"]} for link in links]
-    
-    elif tag_type == "headings":
-        headings = soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6"])[:limit]
-        data = [{"tag": h.name, "text": h.get_text(strip=True)} for h in headings]
-    
-    elif tag_type == "paragraphs":
-        paragraphs = soup.find_all("p")[:limit]
-        data = [{"text": p.get_text(strip=True)} for p in paragraphs]
-    
-    elif tag_type == "customtag" and custom_tag:
-        elements = soup.find_all(custom_tag)[:limit]
-        data = [{"content": elem.get_text(strip=True)} for elem in elements]
-    
-    else:  # alltext - default
-        for script in soup(["script", "style"]):
-            script.decompose()
-        text = soup.get_text()
-        lines = [line.strip() for line in text.splitlines() if line.strip()]
-        data = [{"content": line} for line in lines] # Get ALL lines initially
+    # Parsed once per distinct page body - switching extraction modes is a cache lookup
+    soup = parse_document(html, parser)
+    return build_dataframe(soup, tag_type, limit=limit, custom_tag=custom_tag, parse_text=parse_text, api_key=api_key, model_name=model_name, schema=schema)
+
+def build_dataframe(soup, tag_type="alltext", limit=50, custom_tag=None, parse_text=None, api_key=None, model_name=None, schema=None):
+    """
+    Extract data from a parsed page (optionally through the LLM) and return DataFrame
+    """
+    with span("extract", tag_type=tag_type):
+        rows = iter_rows(soup, tag_type, limit=limit, custom_tag=custom_tag)
+        if (parse_text or schema) and tag_type != "alltext":
+            rows = list(rows)  # chunked for the LLM below as well
+        # Straight into interned column buffers, stopping at `limit` (see results.py)
+        builder = ResultBuilder(columns_for(tag_type), limit=limit).extend(rows)
     
     # AI parsing if requested
-    if parse_text and data:
+    if (parse_text or schema) and len(builder):
         try:
-            from parse import parse_content
+            from parse import normalize_schema, parse_content, parse_structured
             
             # If AI is enabled, we want to process the whole content, not just the limited rows
-            # Combine text into larger chunks (approx 6000 chars) to reduce API calls and provide context
-            full_text_list = [d.get("content", "") for d in data]
-            
-            # Create chunks
-            chunks = []
-            current_chunk = ""
-            for line in full_text_list:
-                if len(current_chunk) + len(line) < 6000:
-                    current_chunk += line + "\n"
+            # Pack it into token-sized chunks to reduce API calls and provide context
+            with span("chunk"):
+                if tag_type == "alltext":
+                    # DOM blocks (cards, rows, list items) stay together, nav/footer boilerplate is dropped
+                    chunks = chunk_page(soup, model_name=model_name)
                 else:
-                    chunks.append(current_chunk)
-                    current_chunk = line + "\n"
-            if current_chunk:
-                chunks.append(current_chunk)
-            
-            # Parse chunks
-            parsed_results = parse_content(chunks, parse_text, api_key=api_key)
+                    lines = [" | ".join(str(v) for v in row if v) for row in rows]
+                    chunks = chunk_blocks(lines, model_name=model_name)
             
-            # Create DataFrame from parsed results
-            df = pd.DataFrame(parsed_results, columns=["Extracted Data"])
+            if schema:
+                # Typed rows, one column per schema field (chunks without candidates never reach the LLM)
+                rows = parse_structured(chunks, schema, parse_text or "", api_key=api_key, model_name=model_name)
+                with span("dataframe"):
+                    df = pd.DataFrame(rows, columns=list(normalize_schema(schema)))
+            else:
+                # Parse chunks
+                parsed_results = parse_content(chunks, parse_text, api_key=api_key, model_name=model_name)
+                
+                # Create DataFrame from parsed results
+                with span("dataframe"):
+                    df = pd.DataFrame(parsed_results, columns=["Extracted Data"])
             
             # Apply limit to the FINAL extracted results
             if limit:
                 df = df.head(limit)
-                
+            
+            inc("rows", len(df))
             return df
             
         except Exception as e:
@@ -142,85 +337,260 @@ def scrape_into_dataframe(url, tag_type="alltext", limit=50, custom_tag=None, pa
             # Fallback to normal behavior if AI fails
             pass
 
-    # If no AI or AI failed, apply limit to raw data and return
-    if limit:
-        data = data[:limit]
-    
-    df = pd.DataFrame(data)
+    # If no AI or AI failed, return the (already limited) raw rows
+    with span("dataframe"):
+        df = builder.to_frame()
+    inc("rows", len(df))
     return df
 
+def scrape_multi(url, types=MULTI_TYPES, limit=50, custom_tags=(), selectors=(), use_proxies=True, parser=None, long_format=False):
+    """
+    Fetch and parse a page once and extract several content types in a single tree walk
+    Returns {type: DataFrame}, or one DataFrame with a "type" column when long_format=True
+    """
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    
+    html = fetch_page(url, use_proxies=use_proxies)
+    soup = parse_document(html, parser)
+    with span("extract", tag_type="multi"):
+        results = extract_many(soup, types, limit=limit, custom_tags=custom_tags, selectors=selectors)
+    
+    frames = {name: frame_from_dicts(rows, columns_for(name) if name in MULTI_TYPES else ("content",)) for name, rows in results.items()}
+    if not long_format:
+        return frames
+    
+    return combine_frames(frames.items(), key="type")
 
-def download_images(urls, base_url=None, output_folder="downloaded_images"):
+def scrape_stream(url, tag_type="alltext", limit=50, custom_tag=None):
     """
-    Download all images from a list of URLs
-    Returns a list of successfully downloaded file paths
+    Streaming version of scrape_into_dataframe for very large pages
+    Yields row dicts as they are parsed and stops downloading once `limit` rows were found
     """
-    import os
-    from urllib.parse import urljoin, urlparse
+    return iter_extract(url, tag_type, limit=limit, custom_tag=custom_tag)
+
+def _scrape_page(url, tag_type, limit, custom_tag, parse_text, use_proxies, api_key, parser=None, follow_links=False, model_name=None, schema=None):
+    """
+    Fetch and extract one page for the batch APIs, returns (DataFrame, absolute links)
+    """
+    html = fetch_page(url, use_proxies=use_proxies)
+    soup = parse_document(html, parser)
     
-    os.makedirs(output_folder, exist_ok=True)
-    downloaded_files = []
+    links = []
+    if follow_links:
+        links = [urljoin(url, href) for _, href in iter_rows(soup, "links", limit=None)]
     
-    for idx, url in enumerate(urls, 1):
-        try:
-            # Ensure url is a string and strip whitespace
-            url = str(url).strip()
+    df = build_dataframe(soup, tag_type, limit=limit, custom_tag=custom_tag, parse_text=parse_text, api_key=api_key, model_name=model_name, schema=schema)
+    return df, links
+
+def _tag_source(df, url):
+    """Add a leading source_url column"""
+    df = df.assign(source_url=url)
+    return df[["source_url"] + [c for c in df.columns if c != "source_url"]]
+
+def _combine_results(results):
+    """Concatenate (url, DataFrame) pairs into one DataFrame with a (categorical) source_url column"""
+    return combine_frames(results, key="source_url")
+
+def _normalize_targets(urls):
+    """Normalize and de-duplicate while keeping the input order"""
+    targets = []
+    for url in urls:
+        url = str(url).strip()
+        if not url or url == 'nan':
+            continue
+        if not url.startswith(('http://', 'https://')):
+            url = 'https://' + url
+        targets.append(url)
+    return list(dict.fromkeys(targets))
+
+def _iter_bounded(func, urls, max_workers, window):
+    """
+    Run func(url) in a thread pool, yielding (url, result) as each call finishes
+    At most `window` calls are submitted ahead of the consumer; failures are printed and skipped
+    """
+    targets = iter(urls)
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        running = {}
+        while True:
+            for url in targets:
+                running[pool.submit(func, url)] = url
+                if len(running) >= window:
+                    break
+            if not running:
+                return
             
-            if not url or url == 'nan':
-                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Failed to scrape {url}: {e}")
+                    continue
+                yield url, result
+
+def iter_fetch(urls, use_proxies=True, max_workers=8, prefetch=None):
+    """
+    Fetch many URLs concurrently, yielding (url, html) as each page arrives
+    At most max_workers + prefetch pages are fetched ahead of the consumer, so a slow
+    consumer pauses the fetching instead of piling up pages in memory
+    """
+    window = max_workers + (max_workers if prefetch is None else prefetch)
+    fetch = functools.partial(fetch_page, use_proxies=use_proxies)
+    yield from _iter_bounded(fetch, _normalize_targets(urls), max_workers, window)
+
+def iter_scrape(urls, tag_type="alltext", limit=50, custom_tag=None, parse_text=None, use_proxies=True, api_key=None, parser=None, max_workers=8, model_name=None, schema=None,
+                process_workers=None, chunksize=None, max_pending=None):
+    """
+    Scrape many URLs concurrently, yielding (url, DataFrame) as each page finishes
+    process_workers: parse + extract in that many worker processes (see workers.py) while
+    max_workers threads keep fetching; chunksize / max_pending tune task size and backpressure.
+    AI extraction (parse_text / schema) always runs in threads.
+    Like iter_fetch, at most 2 x max_workers pages are in flight, so a slow consumer pauses scraping.
+    """
+    if tag_type == "rawhtml":
+        raise ValueError("rawhtml is not supported for batch scraping")
+    
+    if process_workers and not (parse_text or schema):
+        from workers import iter_extract_pages
+        
+        pages = iter_fetch(urls, use_proxies=use_proxies, max_workers=max_workers)
+        for url, columns, rows, _ in iter_extract_pages(pages, tag_type, limit=limit, custom_tag=custom_tag, parser=parser,
+                                                         workers=process_workers, chunksize=chunksize, max_pending=max_pending):
+            with span("dataframe"):
+                df = build_frame(rows, columns)
+            inc("rows", len(df))
+            yield url, df
+        return
+    
+    def scrape(url):
+        return _scrape_page(url, tag_type, limit, custom_tag, parse_text, use_proxies, api_key,
+                            parser=parser, model_name=model_name, schema=schema)[0]
+    
+    yield from _iter_bounded(scrape, _normalize_targets(urls), max_workers, 2 * max_workers)
+
+def scrape_urls(urls, tag_type="alltext", limit=50, custom_tag=None, parse_text=None, use_proxies=True, api_key=None, parser=None, max_workers=8, model_name=None, schema=None,
+                process_workers=None, chunksize=None, max_pending=None):
+    """
+    Scrape many URLs concurrently with a bounded worker pool
+    Returns one DataFrame (in input order) tagged with the source URL
+    """
+    targets = _normalize_targets(urls)
+    results = dict(iter_scrape(targets, tag_type, limit, custom_tag, parse_text, use_proxies, api_key, parser, max_workers,
+                               model_name=model_name, schema=schema,
+                               process_workers=process_workers, chunksize=chunksize, max_pending=max_pending))
+    return _combine_results((url, results[url]) for url in targets if url in results)
+
+def iter_crawl(seed_url, tag_type="alltext", limit=50, custom_tag=None, parse_text=None, use_proxies=True, api_key=None, parser=None,
+               max_pages=50, max_depth=2, same_domain=True, link_pattern=None, max_workers=8, model_name=None, schema=None,
+               use_sitemaps=False, respect_robots=False, frontier_path=None):
+    """
+    Crawl from a seed URL following links found on each page, scraping pages concurrently
+    - max_depth: how many link hops away from the seed to follow
+    - same_domain: only follow links on the seed's host
+    - link_pattern: optional regex a link must match to be followed
+    - use_sitemaps: also queue the URLs from the site's sitemaps (as depth 1)
+    - respect_robots: skip URLs disallowed by robots.txt
+    - frontier_path: keep the frontier in this file so an interrupted crawl can resume
+    Links are canonicalized and de-duplicated by frontier.Frontier (shallow pages first, hosts interleaved)
+    Yields (url, DataFrame) as each page finishes
+    """
+    from frontier import Frontier, canonicalize_url
+    
+    if tag_type == "rawhtml":
+        raise ValueError("rawhtml is not supported for batch scraping")
+    
+    if not seed_url.startswith(('http://', 'https://')):
+        seed_url = 'https://' + seed_url
+    seed_url = canonicalize_url(seed_url) or seed_url
+    seed_host = urlparse(seed_url).netloc
+    pattern = re.compile(link_pattern) if link_pattern else None
+    
+    def allow(link):
+        if same_domain and urlparse(link).netloc != seed_host:
+            return False
+        return not pattern or bool(pattern.search(link)) or link == seed_url
+    
+    frontier = Frontier(frontier_path, allow=allow, respect_robots=respect_robots)
+    frontier.push(seed_url, 0)
+    if use_sitemaps and max_depth >= 1:
+        frontier.seed_from_sitemaps(seed_url, depth=1, limit=max_pages)
+    frontier.commit()
+    submitted = 0
+    
+    with frontier, ThreadPoolExecutor(max_workers=max_workers) as pool:
+        running = {}
+        while True:
+            # Keep the pool full while there is budget left
+            while len(running) < max_workers and submitted < max_pages:
+                item = frontier.pop()
+                if item is None:
+                    break
+                url, depth = item
+                future = pool.submit(
+                    _scrape_page, url, tag_type, limit, custom_tag, parse_text, use_proxies, api_key,
+                    parser=parser, follow_links=depth < max_depth, model_name=model_name, schema=schema
+                )
+                running[future] = (url, depth)
+                submitted += 1
+            if not running:
+                break
             
-            # Handle relative URLs - convert to absolute
-            if base_url and not url.startswith(('http://', 'https://', '//')):
-                # Remove leading ./ or ../
-                while url.startswith('../'):
-                    url = url[3:]
-                while url.startswith('./'):
-                    url = url[2:]
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                url, depth = running.pop(future)
+                try:
+                    df, links = future.result()
+                except Exception as e:
+                    print(f"Failed to scrape {url}: {e}")
+                    frontier.done(url)
+                    continue
                 
-                # Ensure base_url ends without slash, url starts without slash
-                base_url_clean = base_url.rstrip('/')
-                url_clean = url.lstrip('/')
-                url = f"{base_url_clean}/{url_clean}"
-            
-            # Skip if still not a valid URL
-            if not url.startswith(('http://', 'https://')):
-                print(f"Skipping invalid URL: {url}")
+                frontier.push_many(links, depth + 1, base=url)
+                frontier.done(url)  # only now - a crash before this re-queues the page on resume
+                yield url, df
+
+def crawl(seed_url, tag_type="alltext", limit=50, custom_tag=None, parse_text=None, use_proxies=True, api_key=None, parser=None,
+          max_pages=50, max_depth=2, same_domain=True, link_pattern=None, max_workers=8, model_name=None, schema=None,
+          use_sitemaps=False, respect_robots=False, frontier_path=None):
+    """
+    Crawl from a seed URL (see iter_crawl for the link-following rules)
+    Returns one DataFrame tagged with the source URL
+    """
+    return _combine_results(iter_crawl(
+        seed_url, tag_type, limit, custom_tag, parse_text, use_proxies, api_key, parser,
+        max_pages=max_pages, max_depth=max_depth, same_domain=same_domain, link_pattern=link_pattern, max_workers=max_workers,
+        model_name=model_name, schema=schema, use_sitemaps=use_sitemaps, respect_robots=respect_robots, frontier_path=frontier_path
+    ))
+
+def export_results(results, path, fmt=None):
+    """
+    Stream (url, DataFrame) pairs - e.g. from iter_scrape / iter_crawl - into a file
+    as they arrive, one row group / batch per page. Formats: parquet, arrow, jsonl, csv
+    (inferred from the file extension when fmt is None). Returns {"path", "format", "pages", "rows"}
+    """
+    pages = 0
+    with open_writer(path, fmt) as writer:
+        for url, df in results:
+            if df is None or df.empty:
                 continue
-            
-            # Download image
-            headers = {"User-Agent": random.choice(USER_AGENTS)}
-            response = requests.get(url, headers=headers, timeout=10, verify=False)
-            response.raise_for_status()
-            
-            # Extract filename from URL
-            parsed_url = urlparse(url)
-            filename = os.path.basename(parsed_url.path)
-            
-            # Clean up filename - remove query parameters
-            if '?' in filename:
-                filename = filename.split('?')[0]
-            
-            # Fallback filename if URL has no file extension
-            if not filename or '.' not in filename:
-                filename = f"image_{idx}.jpg"
-            
-            # Ensure unique filename to avoid overwrites
-            filepath = os.path.join(output_folder, filename)
-            counter = 1
-            name, ext = os.path.splitext(filename)
-            while os.path.exists(filepath):
-                filepath = os.path.join(output_folder, f"{name}_{counter}{ext}")
-                counter += 1
-            
-            # Save image
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
-            
-            downloaded_files.append(filepath)
-            time.sleep(0.2)  # Polite delay between downloads
-            
-        except Exception as e:
-            print(f"Failed to download {url}: {e}")
-            continue
-    
-    return downloaded_files
\ No newline at end of file
+            writer.write(_tag_source(df, url))
+            pages += 1
+    return {"path": path, "format": writer.fmt, "pages": pages, "rows": writer.rows}
+
+def export_scrape(urls, path, fmt=None, **options):
+    """Scrape many URLs concurrently and stream the results into `path` (see export_results)"""
+    return export_results(iter_scrape(urls, **options), path, fmt)
+
+
+def download_images(urls, base_url=None, output_folder="downloaded_images", max_workers=8, on_complete=None):
+    """
+    Download all images from a list of URLs (concurrently, see images.download_images_report)
+    base_url is the page the images came from - relative URLs are resolved against it
+    on_complete(item) is called as each image finishes (e.g. to add it to a ZipBuilder)
+    Returns a list of successfully downloaded file paths
+    """
+    report = download_images_report(urls, page_url=base_url, output_folder=output_folder, max_workers=max_workers, on_complete=on_complete)
+    return list(dict.fromkeys(item["path"] for item in report if item["path"]))
\ No newline at end of file
@@ -0,0 +1,181 @@
+import random
+import re
+from collections import deque
+
+from lxml import etree
+
+from async_fetch import polite_call
+from http_session import get_session
+
+CHUNK_SIZE = 64 * 1024
+HEADING_TAGS = ("h1", "h2", "h3", "h4", "h5", "h6")
+SKIP_TAGS = ("script", "style")
+
+_CHARSET_RE = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+
+
+class _ExtractTarget:
+    """
+    lxml parser target that turns start/end/data events into the same rows as extract_data
+    Rows are released in document order as soon as they are complete
+    """
+
+    def __init__(self, tag_type, custom_tag=None):
+        self.tag_type = tag_type
+        self.custom_tag = custom_tag.lower() if custom_tag else None
+        self._open = []          # (tag, slot) for every open element, slot is None when not captured
+        self._slots = deque()    # rows in document order, [row, text parts, done]
+        self._text = []          # text node currently being received
+        self._skip = 0           # depth inside script/style
+        self._line = []          # alltext: text of the current, unfinished line
+
+    def _wanted(self, tag, attrib):
+        if self.tag_type == "images":
+            return tag == "img" and "src" in attrib
+        if self.tag_type == "links":
+            return tag == "a" and "href" in attrib
+        if self.tag_type == "headings":
+            return tag in HEADING_TAGS
+        if self.tag_type == "paragraphs":
+            return tag == "p"
+        if self.tag_type == "customtag":
+            return tag == self.custom_tag
+        return False
+
+    def _flush_text(self):
+        if not self._text:
+            return
+        text = "".join(self._text)
+        self._text = []
+        if self._skip:
+            return
+
+        for _, slot in self._open:
+            if slot is not None:
+                slot[1].append(text.strip())
+
+        if self.tag_type == "alltext":
+            *complete, rest = text.split("\n")
+            for piece in complete:
+                self._line.append(piece)
+                self._emit_line()
+            self._line.append(rest)
+
+    def _emit_line(self):
+        line = "".join(self._line).strip()
+        self._line = []
+        if line:
+            self._slots.append([{"content": line}, None, True])
+
+    def start(self, tag, attrib):
+        self._flush_text()
+        if tag in SKIP_TAGS:
+            self._skip += 1
+
+        slot = None
+        if self._wanted(tag, attrib):
+            if tag == "img":
+                row = {"src": attrib["src"], "alt": attrib.get("alt", "")}
+            elif tag == "a":
+                row = {"text": None, "url": attrib["href"]}
+            elif tag in HEADING_TAGS and self.tag_type == "headings":
+                row = {"tag": tag, "text": None}
+            elif self.tag_type == "paragraphs":
+                row = {"text": None}
+            else:
+                row = {"content": None}
+            slot = [row, [], False]
+            self._slots.append(slot)
+        self._open.append((tag, slot))
+
+    def end(self, tag):
+        self._flush_text()
+        if not self._open:
+            return
+        _, slot = self._open.pop()
+        if tag in SKIP_TAGS and self._skip:
+            self._skip -= 1
+        if slot is not None:
+            row, parts, _ = slot
+            for key in ("text", "content"):
+                if key in row:
+                    row[key] = "".join(parts)
+            slot[2] = True
+
+    def data(self, text):
+        self._text.append(text)
+
+    def close(self):
+        self._flush_text()
+        if self.tag_type == "alltext":
+            self._emit_line()
+        # Anything the parser never closed is complete now
+        for _, slot in self._open:
+            if slot is not None:
+                row, parts, _ = slot
+                for key in ("text", "content"):
+                    if key in row:
+                        row[key] = "".join(parts)
+                slot[2] = True
+        self._open = []
+
+    def drain(self):
+        """Pop the finished rows at the front of the queue"""
+        while self._slots and self._slots[0][2]:
+            yield self._slots.popleft()[0]
+
+
+def _guess_encoding(response, first_chunk):
+    match = re.search(r"charset=([\w-]+)", response.headers.get("Content-Type", ""), re.IGNORECASE)
+    if match:
+        return match.group(1)
+    match = _CHARSET_RE.search(first_chunk[:4096])
+    if match:
+        return match.group(1).decode("ascii", errors="ignore")
+    return "utf-8"
+
+
+def iter_extract(url, tag_type="alltext", limit=50, custom_tag=None, chunk_size=CHUNK_SIZE):
+    """
+    Streaming extraction - reads the response in chunks, feeds lxml's incremental
+    HTML parser and yields row dicts (same shape as extract_data) as soon as they are complete.
+    Stops downloading once `limit` rows have been produced.
+    Note: streams straight from the origin (no proxy pool, no response cache).
+    """
+    from scraper_main import USER_AGENTS
+
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    if tag_type == "customtag" and not custom_tag:
+        tag_type = "alltext"
+
+    headers = {"User-Agent": random.choice(USER_AGENTS)}
+    response = polite_call(url, get_session().get, url, headers=headers, timeout=15, verify=False, stream=True)
+    response.raise_for_status()
+
+    target = _ExtractTarget(tag_type, custom_tag)
+    parser = None
+    produced = 0
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if not chunk:
+                continue
+            if parser is None:
+                parser = etree.HTMLParser(target=target, encoding=_guess_encoding(response, chunk))
+            parser.feed(chunk)
+            for row in target.drain():
+                yield row
+                produced += 1
+                if limit and produced >= limit:
+                    return
+
+        if parser is not None:
+            parser.close()
+            for row in target.drain():
+                yield row
+                produced += 1
+                if limit and produced >= limit:
+                    return
+    finally:
+        # Closing early drops the rest of the body instead of downloading it
+        response.close()
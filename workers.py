@@ -0,0 +1,118 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from urllib.parse import urljoin
+
+from doc_cache import DEFAULT_PARSER
+from metrics import observe
+from results import columns_for
+
+# Worker processes for parsing + extraction (None = one per CPU core)
+PROCESS_WORKERS = None
+CHUNKSIZE = 1          # pages sent to a worker per task (raise for many small pages)
+MAX_PENDING = None     # tasks queued or running before the fetch stage is paused (default 2 x workers)
+# Workers are started fresh - forking a process with running fetch threads / event loop can deadlock the child
+START_METHOD = "spawn"
+
+
+def extract_page(url, html, tag_type="alltext", limit=50, custom_tag=None, parser=None, follow_links=False):
+    """
+    Parse and extract one page (runs inside a worker process)
+    Returns a compact, picklable result: (url, columns, rows as tuples, absolute links, (parse s, extract s))
+    """
+    from bs4 import BeautifulSoup
+
+    from scraper_main import iter_rows
+
+    start = time.perf_counter()
+    soup = BeautifulSoup(html, parser or DEFAULT_PARSER)
+    parsed = time.perf_counter()
+
+    columns = columns_for(tag_type)
+    rows = list(iter_rows(soup, tag_type, limit=limit, custom_tag=custom_tag))
+    links = []
+    if follow_links:
+        links = [urljoin(url, href) for _, href in iter_rows(soup, "links", limit=None)]
+    soup.decompose()  # frees the tree right away instead of waiting for the cycle collector
+    return url, columns, rows, links, (parsed - start, time.perf_counter() - parsed)
+
+
+def _extract_batch(pages, options):
+    results = []
+    for url, html in pages:
+        try:
+            results.append(extract_page(url, html, **options))
+        except Exception as e:
+            results.append((url, None, str(e), [], (0.0, 0.0)))
+    return results
+
+
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool(workers=None):
+    """Shared process pool, recreated when a different worker count is asked for"""
+    global _pool, _pool_workers
+    workers = workers or PROCESS_WORKERS or os.cpu_count() or 1
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(START_METHOD))
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_process_pool():
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = _pool_workers = None
+
+
+def iter_extract_pages(pages, tag_type="alltext", limit=50, custom_tag=None, parser=None, follow_links=False,
+                       workers=None, chunksize=None, max_pending=None):
+    """
+    Parse and extract (url, html) pairs in worker processes
+    - pages are sent `chunksize` at a time, at most `max_pending` tasks are queued or running;
+      `pages` is only pulled from when there is room, so a lazy fetch iterator is paused (backpressure)
+    Yields (url, columns, rows, links) as tasks finish; rows are tuples in `columns` order.
+    Pages that fail to parse are reported and skipped.
+    """
+    workers = workers or PROCESS_WORKERS or os.cpu_count() or 1
+    chunksize = max(1, chunksize or CHUNKSIZE)
+    max_pending = max_pending or MAX_PENDING or 2 * workers
+    pool = get_process_pool(workers)
+    options = dict(tag_type=tag_type, limit=limit, custom_tag=custom_tag, parser=parser, follow_links=follow_links)
+
+    pages = iter(pages)
+    running = set()
+    exhausted = False
+    while True:
+        while not exhausted and len(running) < max_pending:
+            batch = []
+            for page in pages:
+                batch.append(page)
+                if len(batch) >= chunksize:
+                    break
+            if len(batch) < chunksize:
+                exhausted = True
+            if batch:
+                running.add(pool.submit(_extract_batch, batch, options))
+        if not running:
+            return
+
+        done, running = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            for url, columns, rows, links, (parse_seconds, extract_seconds) in future.result():
+                if columns is None:
+                    print(f"Failed to parse {url}: {rows}")
+                    continue
+                observe("parse", parse_seconds, parser=parser or DEFAULT_PARSER)
+                observe("extract", extract_seconds, tag_type=tag_type)
+                yield url, columns, rows, links